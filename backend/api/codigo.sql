@@ -98,10 +98,26 @@ CREATE TABLE IF NOT EXISTS public.officials (
     FOREIGN KEY (id) REFERENCES auth.users(id) ON DELETE CASCADE
 );
 
+-- Calendarios de atención, por departamento o por trámite (el del trámite tiene prioridad)
+CREATE TABLE IF NOT EXISTS public.office_calendars (
+    id UUID DEFAULT gen_random_uuid() PRIMARY KEY,
+    department_id UUID REFERENCES public.departments(id) ON DELETE CASCADE,
+    procedure_id UUID REFERENCES public.procedures(id) ON DELETE CASCADE,
+    opening_hours JSONB NOT NULL, -- {"0": [{"start": "09:00", "end": "13:00"}, ...], ...} (0 = lunes)
+    desks INT NOT NULL DEFAULT 1 CHECK (desks BETWEEN 1 AND 255), -- ventanillas en paralelo
+    holidays DATE[] NOT NULL DEFAULT '{}',
+    created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW(),
+    CHECK ((department_id IS NULL) <> (procedure_id IS NULL))
+);
+
 -- Índices para mejorar el rendimiento en búsquedas frecuentes
 -- Índices para mejor rendimiento
 CREATE INDEX IF NOT EXISTS idx_tickets_citizen_id ON public.tickets(citizen_id);
 CREATE INDEX IF NOT EXISTS idx_turnos_citizen_id ON public.turnos(citizen_id);
 CREATE INDEX IF NOT EXISTS idx_chat_messages_session_id ON public.chat_messages(session_id);
+-- Paginación del historial por (timestamp, id) dentro de una sesión
+CREATE INDEX IF NOT EXISTS idx_chat_messages_session_timestamp_id ON public.chat_messages(session_id, timestamp, id);
 CREATE INDEX IF NOT EXISTS idx_citizens_dni ON public.citizens(dni);
 CREATE INDEX IF NOT EXISTS idx_officials_department_id ON public.officials(department_id);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_office_calendars_department_id ON public.office_calendars(department_id) WHERE department_id IS NOT NULL;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_office_calendars_procedure_id ON public.office_calendars(procedure_id) WHERE procedure_id IS NOT NULL;
@@ -0,0 +1,109 @@
+"""
+Benchmark de fan-out del chat: latencia desde que se publica un mensaje en
+Redis hasta que el ConnectionManager lo entrega al socket de su sesión.
+
+Registra N sesiones con sockets simulados (sin red) en el `manager` de
+`endpoints.chat`, publica mensajes en `chat_channel:{session_id}` de sesiones
+al azar y mide cuánto tarda cada uno en llegar. También informa cuántas
+conexiones tiene abiertas el servidor de Redis antes y después de registrar
+las sesiones, que no debería depender de N.
+
+Necesita el Redis de REDIS_URL. Uso (desde src/api):
+    python -m benchmarks.chat_fanout --sessions 10000 --messages 5000
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import time
+import uuid
+from typing import Dict, List
+
+from core.redis import async_redis_client
+from endpoints.chat import CHAT_CHANNEL_PREFIX, manager
+
+
+class FakeWebSocket:
+    """Socket simulado: anota cuándo llega cada mensaje."""
+
+    def __init__(self, arrivals: Dict[str, float]):
+        self.arrivals = arrivals
+
+    async def accept(self):
+        pass
+
+    async def send_text(self, message: str):
+        self.arrivals[message] = time.perf_counter()
+
+    async def close(self, code: int = 1000):
+        pass
+
+
+def percentile(sorted_values: List[float], pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+async def redis_connections() -> int:
+    return len(await async_redis_client.client_list())
+
+
+async def run(sessions: int, messages: int, concurrency: int) -> None:
+    connections_before = await redis_connections()
+    arrivals: Dict[str, float] = {}
+    session_ids = [uuid.uuid4() for _ in range(sessions)]
+    # connect() imprime una línea por sesión; no hace falta verlas
+    with contextlib.redirect_stdout(io.StringIO()):
+        connections = [
+            (session_id, await manager.connect(FakeWebSocket(arrivals), session_id))
+            for session_id in session_ids
+        ]
+    connections_after = await redis_connections()
+
+    published: Dict[str, float] = {}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def publish(number: int):
+        session_id = session_ids[number % sessions]
+        payload = f"{number}:{session_id}"
+        async with semaphore:
+            published[payload] = time.perf_counter()
+            await async_redis_client.publish(f"{CHAT_CHANNEL_PREFIX}{session_id}", payload)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(publish(number) for number in range(messages)))
+    # Esperamos a que lleguen todos (o a que pasen 10 segundos sin novedades)
+    deadline = time.perf_counter() + 10
+    while len(arrivals) < messages and time.perf_counter() < deadline:
+        await asyncio.sleep(0.01)
+    elapsed = time.perf_counter() - started
+
+    latencies = sorted(arrivals[payload] - sent for payload, sent in published.items() if payload in arrivals)
+    print(f"Sesiones: {sessions}  mensajes: {messages}  entregados: {len(latencies)}")
+    print(f"Conexiones a Redis: {connections_before} antes, {connections_after} con las sesiones registradas")
+    print(
+        f"Latencia publicación -> socket: p50={percentile(latencies, 50) * 1000:.2f} ms "
+        f"p95={percentile(latencies, 95) * 1000:.2f} ms p99={percentile(latencies, 99) * 1000:.2f} ms"
+    )
+    print(f"Throughput: {len(latencies) / elapsed:.0f} mensajes/s")
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        for session_id, connection in connections:
+            manager.disconnect(session_id, connection)
+    await manager.stop_listener()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de fan-out del chat por Redis.")
+    parser.add_argument("--sessions", type=int, default=10000)
+    parser.add_argument("--messages", type=int, default=5000)
+    parser.add_argument("--concurrency", type=int, default=100, help="Publicaciones en vuelo a la vez")
+    args = parser.parse_args()
+    asyncio.run(run(args.sessions, args.messages, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Prueba de carga de reserva de turnos: N ciudadanos intentan tomar a la vez
+unos pocos slots del mismo trámite y día, y se verifica en la base que
+ningún slot quedó con más turnos que ventanillas.
+
+Llama a la app en el mismo proceso (sin red), contra el Redis de REDIS_URL y
+el Supabase configurado. Los turnos creados se borran al terminar (y con
+ellos el índice de disponibilidad del día), salvo con --keep. Uso (desde src/api):
+    python -m benchmarks.turno_booking --procedure-id <uuid> --citizen-dni <dni> --bookers 500
+"""
+
+import argparse
+import asyncio
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import List, Optional
+
+import httpx
+
+from benchmarks.chat_fanout import percentile
+from core.availability import BOOKED_STATUSES, availability_key, day_slots, procedure_schedule, slot_start, to_utc_naive
+from core.redis import async_redis_client
+from db.supabase_client import async_supabase
+from main import app
+
+
+async def book(client: httpx.AsyncClient, procedure_id: str, citizen_dni: str,
+               slot: datetime, use_holds: bool) -> tuple:
+    """Intenta reservar el slot; devuelve (status final, segundos, id del turno si se creó)."""
+    started = time.perf_counter()
+    body = {"procedure_id": procedure_id, "scheduled_at": slot.isoformat(), "citizen_dni": citizen_dni}
+    if use_holds:
+        hold = await client.post("/api/v1/turnos/holds", json=body)
+        if hold.status_code != 201:
+            return hold.status_code, time.perf_counter() - started, None
+        body["hold_id"] = hold.json()["hold_id"]
+    response = await client.post("/api/v1/turnos/", json=body)
+    turno_id = response.json()["id"] if response.status_code == 201 else None
+    return response.status_code, time.perf_counter() - started, turno_id
+
+
+async def booked_per_slot(procedure_id: str, day: date) -> Counter:
+    start = datetime.combine(day, datetime.min.time())
+    end = datetime.combine(day, datetime.max.time())
+    response = await async_supabase.table("turnos").select("scheduled_at").eq("procedure_id", procedure_id).gte("scheduled_at", start.isoformat()).lte("scheduled_at", end.isoformat()).in_("status", BOOKED_STATUSES).execute()
+    return Counter(
+        to_utc_naive(datetime.fromisoformat(turno["scheduled_at"].replace("Z", "+00:00")))
+        for turno in response.data
+    )
+
+
+async def run(procedure_id: str, citizen_dni: str, day: date, bookers: int,
+              slots: int, use_holds: bool, keep: bool) -> None:
+    schedule = await procedure_schedule(procedure_id)
+    if schedule is None:
+        raise SystemExit(f"No existe el trámite {procedure_id}")
+    starts = day_slots(schedule, day)
+    if len(starts) < slots:
+        raise SystemExit(f"El trámite tiene {len(starts)} slots el {day}")
+    targets = [slot_start(day, minutes) for minutes in starts[:slots]]
+    before = await booked_per_slot(procedure_id, day)
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://benchmark") as client:
+        started = time.perf_counter()
+        results = await asyncio.gather(*(
+            book(client, procedure_id, citizen_dni, targets[number % slots], use_holds)
+            for number in range(bookers)
+        ))
+        elapsed = time.perf_counter() - started
+
+    after = await booked_per_slot(procedure_id, day)
+    statuses = Counter(status for status, _, _ in results)
+    latencies = sorted(seconds for _, seconds, _ in results)
+    created: List[Optional[str]] = [turno_id for _, _, turno_id in results if turno_id]
+    overbooked = sum(max(0, after[slot] - schedule.desks) for slot in targets)
+
+    print(f"Reservas: {bookers} ciudadanos sobre {slots} slots del {day} ({'con' if use_holds else 'sin'} hold previo)")
+    print(f"Respuestas: {dict(sorted(statuses.items()))}")
+    print("Turnos por slot: " + ", ".join(
+        f"{slot:%H:%M}={after[slot]}" + (f" ({before[slot]} previos)" if before[slot] else "") for slot in targets
+    ))
+    print(f"Turnos de más (sobre {schedule.desks} ventanillas): {overbooked}")
+    print(
+        f"Latencia: p50={percentile(latencies, 50) * 1000:.1f} ms p95={percentile(latencies, 95) * 1000:.1f} ms "
+        f"p99={percentile(latencies, 99) * 1000:.1f} ms  total={elapsed:.2f} s"
+    )
+
+    if created and not keep:
+        await async_supabase.table("turnos").delete().in_("id", created).execute()
+        # Borrarlos no pasa por cancel_turno: el índice del día se descarta para que se vuelva a armar
+        await async_redis_client.delete(availability_key(procedure_id, schedule, day))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Prueba de carga de reserva de turnos.")
+    parser.add_argument("--procedure-id", required=True)
+    parser.add_argument("--citizen-dni", required=True)
+    parser.add_argument("--date", type=date.fromisoformat, default=date.today() + timedelta(days=60),
+                        help="Día a reservar, YYYY-MM-DD (por defecto, dentro de 60 días)")
+    parser.add_argument("--bookers", type=int, default=500)
+    parser.add_argument("--slots", type=int, default=5, help="Slots distintos que se disputan")
+    parser.add_argument("--direct", action="store_true", help="Crear el turno sin pedir antes un hold")
+    parser.add_argument("--keep", action="store_true", help="No borrar los turnos creados")
+    args = parser.parse_args()
+    asyncio.run(run(args.procedure_id, args.citizen_dni, args.date, args.bookers,
+                    args.slots, not args.direct, args.keep))
+
+
+if __name__ == "__main__":
+    main()
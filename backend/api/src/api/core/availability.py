@@ -0,0 +1,418 @@
+"""
+Índice de disponibilidad de turnos por trámite y día.
+
+Cada trámite tiene un calendario de atención: el suyo en `office_calendars`,
+o si no tiene, el de su departamento, o si tampoco, lunes a viernes de 9 a 17
+con una ventanilla. El calendario se compila, junto con la duración del
+trámite, en un `ProcedureSchedule`: para cada día de la semana, los minutos
+del día en que empieza cada slot, más la cantidad de ventanillas y los
+feriados. Se guarda en memoria para no buscarlo en la base en cada consulta.
+
+Cada día de un trámite es un contador de un byte por slot en Redis
+(`availability:{procedure_id}:{plantilla}:{fecha}`) con los turnos tomados en
+ese slot: un slot está libre mientras tenga menos turnos que ventanillas.
+Consultar la disponibilidad es leer unos pocos bytes; `create_turno` y
+`cancel_turno` suman o restan uno. La primera consulta de un día (o después de
+que vence, a los AVAILABILITY_CACHE_TTL segundos) arma los contadores con una
+sola consulta (paginada por id) de los turnos tomados; `next_openings` arma todos los días que
+le faltan a una ventana con una sola consulta. La plantilla va en la clave:
+si cambian los horarios o la duración, se arma un índice nuevo.
+
+Mientras se arma un día, `mark_slot` anota los turnos nuevos en
+`{clave}:deferred` y el armado los suma al guardar el índice, que nunca pisa
+uno guardado por otro. Las cancelaciones de ese momento no se anotan: el
+índice solo puede errar contando de más. Un turno guardado justo al empezar
+el armado puede contarse dos veces, y uno cancelado después de la consulta
+sigue contado: el slot se ve ocupado hasta que vence el índice, nunca libre
+de más.
+"""
+import asyncio
+import hashlib
+from bisect import bisect_left
+from datetime import date, datetime, time, timedelta, timezone
+from typing import AsyncIterator, Dict, FrozenSet, List, NamedTuple, Optional, Tuple
+from uuid import UUID
+
+from redis.exceptions import RedisError
+from core.config import settings
+from core.redis import async_redis_client
+from core.utils import TTLCache
+from db.supabase_client import async_supabase
+
+AVAILABILITY_KEY_PREFIX = "availability:"
+# Calendario de los trámites sin calendario propio ni de su departamento
+DEFAULT_OPENING_HOURS = {weekday: [{"start": "09:00", "end": "17:00"}] for weekday in range(5)}
+DEFAULT_DESKS = 1
+# Estados de turno que ocupan el slot
+BOOKED_STATUSES = ["programado", "completado"]
+
+# Segundos que puede tardar como máximo el armado de un índice
+BUILD_TTL = 60
+
+# Un byte por slot: SAT hace que nunca pase de 255 ni baje de 0. Si el índice
+# no existe pero se está armando, un turno nuevo se anota para sumarlo al
+# terminar; una cancelación no, porque la consulta del armado ya pudo no verla
+_INCRBY_OR_DEFER = async_redis_client.register_script("""
+if redis.call('EXISTS', KEYS[1]) == 1 then
+    return redis.call('BITFIELD', KEYS[1], 'OVERFLOW', 'SAT', 'INCRBY', 'u8', '#' .. ARGV[1], ARGV[2])[1]
+end
+if redis.call('EXISTS', KEYS[3]) == 1 and tonumber(ARGV[2]) > 0 then
+    redis.call('HINCRBY', KEYS[2], ARGV[1], ARGV[2])
+    redis.call('EXPIRE', KEYS[2], ARGV[3])
+end
+return -1
+""")
+
+# Guarda los contadores armados (más los cambios anotados mientras tanto) solo
+# si nadie guardó el índice antes, y devuelve los que quedaron
+_STORE_IF_ABSENT = async_redis_client.register_script("""
+local slots = #ARGV - 1
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    for index = 0, slots - 1 do
+        redis.call('BITFIELD', KEYS[1], 'SET', 'u8', '#' .. index, ARGV[index + 2])
+    end
+    local deferred = redis.call('HGETALL', KEYS[2])
+    for i = 1, #deferred, 2 do
+        redis.call('BITFIELD', KEYS[1], 'OVERFLOW', 'SAT', 'INCRBY', 'u8', '#' .. deferred[i], deferred[i + 1])
+    end
+    redis.call('EXPIRE', KEYS[1], ARGV[1])
+end
+if redis.call('DECR', KEYS[3]) <= 0 then
+    redis.call('DEL', KEYS[2], KEYS[3])
+end
+local get = {}
+for index = 0, slots - 1 do
+    table.insert(get, 'GET')
+    table.insert(get, 'u8')
+    table.insert(get, '#' .. index)
+end
+return redis.call('BITFIELD', KEYS[1], unpack(get))
+""")
+
+
+class ProcedureSchedule(NamedTuple):
+    duration: int
+    desks: int
+    holidays: FrozenSet[date]
+    # Por día de la semana (0 = lunes), minutos del día en que empieza cada slot
+    templates: Tuple[Tuple[int, ...], ...]
+    # Identifica las plantillas, para la clave del índice
+    fingerprint: str
+
+
+_schedules = TTLCache(max_size=settings.PROCEDURE_CACHE_SIZE, ttl_seconds=settings.PROCEDURE_CACHE_TTL)
+# Consultas de calendario en curso por trámite, y contadores en construcción por (trámite, día)
+_schedule_loads: Dict[str, asyncio.Task] = {}
+_count_builds: Dict[Tuple[str, date], asyncio.Task] = {}
+
+
+def _minutes(value: str) -> int:
+    parsed = time.fromisoformat(value)
+    return parsed.hour * 60 + parsed.minute
+
+
+def compile_schedule(duration: int, calendar: Optional[dict] = None) -> ProcedureSchedule:
+    """Las plantillas de slots de un trámite con esa duración, según su calendario (una fila de office_calendars)."""
+    opening_hours = calendar["opening_hours"] if calendar else DEFAULT_OPENING_HOURS
+    templates = []
+    for weekday in range(7):
+        # En JSON las claves llegan como texto
+        intervals = opening_hours.get(weekday, opening_hours.get(str(weekday), []))
+        starts = set()
+        for interval in intervals:
+            start, end = _minutes(interval["start"]), _minutes(interval["end"])
+            starts.update(range(start, end - duration + 1, duration))
+        templates.append(tuple(sorted(starts)))
+    templates = tuple(templates)
+    return ProcedureSchedule(
+        duration=duration,
+        desks=calendar["desks"] if calendar else DEFAULT_DESKS,
+        holidays=frozenset(date.fromisoformat(day) for day in (calendar or {}).get("holidays") or []),
+        templates=templates,
+        fingerprint=hashlib.sha1(repr(templates).encode()).hexdigest()[:12],
+    )
+
+
+def availability_key(procedure_id, schedule: ProcedureSchedule, day: date) -> str:
+    return f"{AVAILABILITY_KEY_PREFIX}{procedure_id}:{schedule.fingerprint}:{day.isoformat()}"
+
+
+def _build_keys(key: str) -> List[str]:
+    """El índice, los cambios anotados mientras se arma y cuántos lo están armando."""
+    return [key, f"{key}:deferred", f"{key}:building"]
+
+
+def day_slots(schedule: ProcedureSchedule, day: date) -> Tuple[int, ...]:
+    """Minutos del día en que empieza cada slot de ese día; ninguno si es feriado o no se atiende."""
+    if day in schedule.holidays:
+        return ()
+    return schedule.templates[day.weekday()]
+
+
+def slot_start(day: date, minutes: int) -> datetime:
+    return datetime.combine(day, time()) + timedelta(minutes=minutes)
+
+
+def slot_index(schedule: ProcedureSchedule, scheduled_at: datetime) -> Optional[int]:
+    """Número de slot de un turno en su día, o None si no cae en el inicio de un slot del calendario."""
+    # Los horarios de los slots son sin zona; los turnos se guardan en UTC
+    scheduled_at = to_utc_naive(scheduled_at)
+    if scheduled_at.second or scheduled_at.microsecond:
+        return None
+    slots = day_slots(schedule, scheduled_at.date())
+    minutes = scheduled_at.hour * 60 + scheduled_at.minute
+    index = bisect_left(slots, minutes)
+    return index if index < len(slots) and slots[index] == minutes else None
+
+
+def to_utc_naive(scheduled_at: datetime) -> datetime:
+    """Horario sin zona, en UTC, como los de los slots; los que vienen sin zona se toman como UTC."""
+    if scheduled_at.tzinfo is not None:
+        scheduled_at = scheduled_at.astimezone(timezone.utc).replace(tzinfo=None)
+    return scheduled_at
+
+
+def parse_timestamp(value: str) -> datetime:
+    return datetime.fromisoformat(value.replace('Z', '+00:00'))
+
+
+async def procedure_schedules(procedure_ids: List[UUID]) -> Dict[str, ProcedureSchedule]:
+    """
+    El calendario compilado de cada trámite que existe, por id. Los que faltan
+    en memoria se buscan en una consulta, compartida con otros requests que
+    los estén buscando al mismo tiempo.
+    """
+    schedules: Dict[str, ProcedureSchedule] = {}
+    pending: Dict[str, asyncio.Task] = {}
+    missing = []
+    for procedure_id in dict.fromkeys(str(procedure_id) for procedure_id in procedure_ids):
+        schedule = _schedules.get(procedure_id)
+        if schedule is not None:
+            schedules[procedure_id] = schedule
+        elif procedure_id in _schedule_loads:
+            pending[procedure_id] = _schedule_loads[procedure_id]
+        else:
+            missing.append(procedure_id)
+    if missing:
+        task = asyncio.ensure_future(_load_schedules(missing))
+        for procedure_id in missing:
+            _schedule_loads[procedure_id] = task
+            pending[procedure_id] = task
+        task.add_done_callback(lambda done: [_schedule_loads.pop(procedure_id, None) for procedure_id in missing])
+    for task in set(pending.values()):
+        loaded = await asyncio.shield(task)
+        schedules.update((procedure_id, loaded[procedure_id]) for procedure_id in pending if procedure_id in loaded)
+    return schedules
+
+
+async def _load_schedules(procedure_ids: List[str]) -> Dict[str, ProcedureSchedule]:
+    response = await async_supabase.table("procedures").select("id,duration_minutes,department_id").in_("id", procedure_ids).execute()
+    procedures = response.data
+    if not procedures:
+        return {}
+    # Los calendarios propios y los de sus departamentos, en una consulta
+    scopes = f"procedure_id.in.({','.join(procedure['id'] for procedure in procedures)})"
+    department_ids = sorted({procedure['department_id'] for procedure in procedures if procedure.get('department_id')})
+    if department_ids:
+        scopes += f",department_id.in.({','.join(department_ids)})"
+    response = await async_supabase.table("office_calendars").select("*").or_(scopes).execute()
+    by_procedure = {calendar['procedure_id']: calendar for calendar in response.data if calendar.get('procedure_id')}
+    by_department = {calendar['department_id']: calendar for calendar in response.data if calendar.get('department_id')}
+
+    loaded = {}
+    for procedure in procedures:
+        calendar = by_procedure.get(procedure['id']) or by_department.get(procedure.get('department_id'))
+        loaded[procedure['id']] = compile_schedule(procedure['duration_minutes'], calendar)
+        _schedules.put(procedure['id'], loaded[procedure['id']])
+    return loaded
+
+
+async def procedure_schedule(procedure_id: UUID) -> Optional[ProcedureSchedule]:
+    """Calendario compilado del trámite, o None si no existe."""
+    return (await procedure_schedules([procedure_id])).get(str(procedure_id))
+
+
+def invalidate_procedure(procedure_id: UUID):
+    _schedules.invalidate(str(procedure_id))
+
+
+def invalidate_schedules():
+    """Descarta todos los calendarios compilados: el de un departamento alcanza a todos sus trámites."""
+    _schedules.clear()
+
+
+async def available_slots(procedure_id: UUID, day: date) -> Optional[List[datetime]]:
+    """Horarios con alguna ventanilla libre del trámite en ese día, o None si el trámite no existe."""
+    schedule = await procedure_schedule(procedure_id)
+    if schedule is None:
+        return None
+    counts = await _day_counts({str(procedure_id): schedule}, [day])
+    slots = day_slots(schedule, day)
+    return [slot_start(day, slots[index]) for index in _free_slots(counts[str(procedure_id), day], schedule.desks)]
+
+
+async def slot_bookings(procedure_id: UUID, schedule: ProcedureSchedule, scheduled_at: datetime) -> Optional[int]:
+    """Turnos tomados en el slot de ese horario según el índice (que se arma si hace falta); None si no es un slot."""
+    scheduled_at = to_utc_naive(scheduled_at)
+    index = slot_index(schedule, scheduled_at)
+    if index is None:
+        return None
+    counts = await _day_counts({str(procedure_id): schedule}, [scheduled_at.date()])
+    return counts[str(procedure_id), scheduled_at.date()][index]
+
+
+async def next_openings(schedules: Dict[str, ProcedureSchedule], first_day: date, last_day: date,
+                        limit: int, after: Optional[datetime] = None) -> AsyncIterator[Tuple[str, datetime]]:
+    """
+    Los primeros `limit` horarios libres de esos trámites entre las dos fechas
+    (inclusive) y posteriores a `after`, en orden, como (procedure_id, horario).
+    Todos los días salen de una lectura de Redis; los que no tienen índice, de
+    una sola consulta de turnos para toda la ventana.
+    """
+    days = [first_day + timedelta(days=offset) for offset in range((last_day - first_day).days + 1)]
+    counts = await _day_counts(schedules, days)
+    found = 0
+    for day in days:
+        openings = sorted(
+            (slot_start(day, day_slots(schedule, day)[index]), procedure_id)
+            for procedure_id, schedule in schedules.items()
+            for index in _free_slots(counts[procedure_id, day], schedule.desks)
+        )
+        for slot, procedure_id in openings:
+            if after is not None and slot <= after:
+                continue
+            yield procedure_id, slot
+            found += 1
+            if found >= limit:
+                return
+
+
+def _free_slots(counts: List[int], desks: int) -> List[int]:
+    return [index for index, booked in enumerate(counts) if booked < desks]
+
+
+async def _day_counts(schedules: Dict[str, ProcedureSchedule], days: List[date]) -> Dict[Tuple[str, date], List[int]]:
+    """Los turnos tomados por slot de cada (trámite, día), armando en una sola pasada los que todavía no existen."""
+    counts: Dict[Tuple[str, date], List[int]] = {}
+    pairs = []
+    for procedure_id, schedule in schedules.items():
+        for day in days:
+            # Los feriados y los días que no se atiende no tienen índice
+            if day_slots(schedule, day):
+                pairs.append((procedure_id, day))
+            else:
+                counts[procedure_id, day] = []
+    if not pairs:
+        return counts
+
+    # Se lee con BITFIELD porque el cliente decodifica las respuestas como texto
+    pipe = async_redis_client.pipeline(transaction=False)
+    for procedure_id, day in pairs:
+        key = availability_key(procedure_id, schedules[procedure_id], day)
+        pipe.exists(key)
+        bitfield = pipe.bitfield(key)
+        for index in range(len(day_slots(schedules[procedure_id], day))):
+            bitfield.get("u8", f"#{index}")
+        bitfield.execute()
+    results = await pipe.execute()
+
+    missing = []
+    for position, pair in enumerate(pairs):
+        exists, values = results[2 * position], results[2 * position + 1]
+        if exists:
+            counts[pair] = list(values)
+        else:
+            missing.append(pair)
+    # Los días que ya se están armando para otro request se esperan en vez de consultarlos de nuevo
+    pending: Dict[Tuple[str, date], asyncio.Task] = {}
+    to_build = []
+    for pair in missing:
+        if pair in _count_builds:
+            pending[pair] = _count_builds[pair]
+        else:
+            to_build.append(pair)
+    if to_build:
+        task = asyncio.ensure_future(_build_counts(schedules, to_build))
+        for pair in to_build:
+            _count_builds[pair] = task
+            pending[pair] = task
+        task.add_done_callback(lambda done: [_count_builds.pop(pair, None) for pair in to_build])
+    for task in set(pending.values()):
+        built = await asyncio.shield(task)
+        counts.update((pair, built[pair]) for pair in pending if pair in built)
+    return counts
+
+
+async def _build_counts(schedules: Dict[str, ProcedureSchedule],
+                        pairs: List[Tuple[str, date]]) -> Dict[Tuple[str, date], List[int]]:
+    keys = {pair: availability_key(pair[0], schedules[pair[0]], pair[1]) for pair in pairs}
+    # Antes de consultar la base: un turno que se guarde o cancele durante la
+    # consulta queda anotado por mark_slot y se suma al guardar el índice
+    pipe = async_redis_client.pipeline(transaction=False)
+    for key in keys.values():
+        building = _build_keys(key)[2]
+        pipe.incr(building)
+        pipe.expire(building, BUILD_TTL)
+    await pipe.execute()
+
+    procedure_ids = sorted({procedure_id for procedure_id, _ in pairs})
+    start = datetime.combine(min(day for _, day in pairs), datetime.min.time())
+    end = datetime.combine(max(day for _, day in pairs), datetime.max.time())
+    counts = {(procedure_id, day): [0] * len(day_slots(schedules[procedure_id], day)) for procedure_id, day in pairs}
+    for turno in await _booked_turnos(procedure_ids, start, end):
+        scheduled_at = to_utc_naive(parse_timestamp(turno['scheduled_at']))
+        day_counts = counts.get((turno['procedure_id'], scheduled_at.date()))
+        if day_counts is None:
+            continue
+        index = slot_index(schedules[turno['procedure_id']], scheduled_at)
+        if index is not None:
+            day_counts[index] = min(day_counts[index] + 1, 255)
+
+    # Si otro proceso guardó el índice mientras tanto, vale el suyo
+    pipe = async_redis_client.pipeline(transaction=False)
+    for pair, day_counts in counts.items():
+        await _STORE_IF_ABSENT(keys=_build_keys(keys[pair]), args=[settings.AVAILABILITY_CACHE_TTL, *day_counts],
+                               client=pipe)
+    stored = await pipe.execute()
+    return {pair: list(values) for pair, values in zip(counts, stored)}
+
+
+async def _booked_turnos(procedure_ids: List[str], start: datetime, end: datetime) -> List[dict]:
+    """
+    Los turnos tomados de esos trámites entre las dos fechas, por páginas:
+    PostgREST corta cada respuesta en db-max-rows sin avisar, así que se sigue
+    pidiendo hasta que vuelve una página incompleta. Cada página empieza
+    después del último id visto (y no en un offset), así un turno que se
+    guarda o cancela mientras tanto no corre a los demás de página.
+    """
+    page_size = settings.AVAILABILITY_PAGE_SIZE
+    turnos = []
+    while True:
+        query = async_supabase.table("turnos").select("id,procedure_id,scheduled_at") \
+            .in_("procedure_id", procedure_ids).gte("scheduled_at", start.isoformat()) \
+            .lte("scheduled_at", end.isoformat()).in_("status", BOOKED_STATUSES)
+        if turnos:
+            query = query.gt("id", turnos[-1]["id"])
+        response = await query.order("id").limit(page_size).execute()
+        turnos.extend(response.data)
+        if len(response.data) < page_size:
+            return turnos
+
+
+async def mark_slot(procedure_id: UUID, scheduled_at, booked: bool):
+    """Suma o resta un turno en el slot, si el índice de ese día está armado o armándose."""
+    schedule = await procedure_schedule(procedure_id)
+    if schedule is None:
+        return
+    if isinstance(scheduled_at, str):
+        scheduled_at = parse_timestamp(scheduled_at)
+    index = slot_index(schedule, scheduled_at)
+    if index is None:
+        return
+    day = to_utc_naive(scheduled_at).date()
+    try:
+        await _INCRBY_OR_DEFER(keys=_build_keys(availability_key(procedure_id, schedule, day)),
+                               args=[index, 1 if booked else -1, BUILD_TTL])
+    except RedisError as e:
+        # El turno ya está guardado; el índice se corrige cuando vence
+        print(f"No se pudo actualizar la disponibilidad del trámite {procedure_id}: {e}")
@@ -0,0 +1,149 @@
+"""
+Historial del chat: paginación por cursor y caché de los últimos mensajes.
+
+Las páginas se piden con keyset sobre (timestamp, id): un cursor codifica
+esos dos valores del último mensaje visto, así que cada página es una
+búsqueda por índice y no un OFFSET que recorre toda la conversación.
+
+Los últimos CHAT_HISTORY_CACHE_SIZE mensajes de cada sesión activa se
+guardan en una lista de Redis (`chat_history:{session_id}`). `send_message`
+agrega siempre cada mensaje nuevo a la lista, y la primera lectura de la
+sesión la completa desde Supabase sumando lo que se agregó mientras tanto
+(con write-behind, los mensajes que el flusher todavía no guardó solo están
+ahí). Hasta entonces la lista puede estar incompleta: solo se lee si existe
+`chat_history:{session_id}:filled`.
+"""
+import base64
+import binascii
+import json
+import re
+from datetime import datetime
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+from redis.exceptions import WatchError
+
+from core.config import settings
+from core.redis import async_redis_client
+from db.supabase_client import async_supabase
+
+HISTORY_KEY_PREFIX = "chat_history:"
+# Columnas que devuelve el historial (las de schemas.chat.Message)
+MESSAGE_COLUMNS = "id,session_id,sender_id,sender_type,content,timestamp"
+# Los valores del cursor van dentro del filtro de PostgREST: solo aceptamos un timestamp ISO
+TIMESTAMP_PATTERN = re.compile(r"^\d{4}-\d{2}-\d{2}[T ][\d:.]+(Z|[+-]\d{2}:?\d{2})?$")
+
+
+def history_key(session_id) -> str:
+    return f"{HISTORY_KEY_PREFIX}{session_id}"
+
+
+def filled_key(session_id) -> str:
+    return f"{HISTORY_KEY_PREFIX}{session_id}:filled"
+
+
+def encode_cursor(message_row: dict) -> str:
+    raw = json.dumps([message_row["timestamp"], str(message_row["id"])])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def decode_cursor(cursor: str) -> Tuple[str, str]:
+    """Devuelve (timestamp, id); ValueError si el cursor no es válido."""
+    try:
+        timestamp, message_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        message_id = str(UUID(message_id))
+    except (binascii.Error, json.JSONDecodeError, AttributeError, TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(timestamp, str) or not TIMESTAMP_PATTERN.match(timestamp):
+        raise ValueError("Invalid cursor")
+    return timestamp, message_id
+
+
+def cache_message(pipe, message_row: dict):
+    """Agrega el mensaje a la caché de la sesión dentro de `pipe`."""
+    key = history_key(message_row["session_id"])
+    pipe.rpush(key, json.dumps(message_row))
+    pipe.ltrim(key, -settings.CHAT_HISTORY_CACHE_SIZE, -1)
+    # Mientras la sesión tenga movimiento, su caché no vence
+    pipe.expire(key, settings.CHAT_HISTORY_CACHE_TTL)
+    pipe.expire(filled_key(message_row["session_id"]), settings.CHAT_HISTORY_CACHE_TTL)
+
+
+async def cached_latest(session_id, limit: int) -> Optional[List[dict]]:
+    """
+    Los últimos `limit` mensajes desde Redis, o None si la sesión no está en
+    caché o si se piden más mensajes de los que se guardan. La caché siempre
+    se llena con los últimos CHAT_HISTORY_CACHE_SIZE mensajes (o todos, si
+    son menos), así que una lista más corta que `limit` es la sesión completa.
+    """
+    if limit > settings.CHAT_HISTORY_CACHE_SIZE:
+        return None
+    pipe = async_redis_client.pipeline(transaction=False)
+    pipe.exists(filled_key(session_id))
+    pipe.lrange(history_key(session_id), -limit, -1)
+    filled, items = await pipe.execute()
+    if not filled or not items:
+        return None
+    return [json.loads(item) for item in items]
+
+
+def _message_order(message_row: dict):
+    # Supabase y el servidor no escriben el timestamp igual: se comparan como fechas
+    return datetime.fromisoformat(message_row["timestamp"].replace("Z", "+00:00")), str(message_row["id"])
+
+
+async def fill_cache(session_id, messages: List[dict]) -> List[dict]:
+    """
+    Completa la caché de la sesión con sus últimos mensajes de Supabase y
+    devuelve el resultado, en orden cronológico. Los mensajes que ya estaban
+    en la lista (enviados durante la consulta, o todavía sin guardar con
+    write-behind) se conservan: si otro agrega uno mientras tanto, se reintenta.
+    """
+    key = history_key(session_id)
+    async with async_redis_client.pipeline(transaction=True) as pipe:
+        while True:
+            try:
+                await pipe.watch(key)
+                merged = {str(row["id"]): row for row in messages}
+                for item in await pipe.lrange(key, 0, -1):
+                    row = json.loads(item)
+                    merged.setdefault(str(row["id"]), row)
+                rows = sorted(merged.values(), key=_message_order)
+                if not rows:
+                    await pipe.reset()
+                    return rows
+                pipe.multi()
+                pipe.delete(key)
+                pipe.rpush(key, *(json.dumps(row) for row in rows[-settings.CHAT_HISTORY_CACHE_SIZE:]))
+                pipe.expire(key, settings.CHAT_HISTORY_CACHE_TTL)
+                pipe.set(filled_key(session_id), 1, ex=settings.CHAT_HISTORY_CACHE_TTL)
+                await pipe.execute()
+                return rows
+            except WatchError:
+                continue
+
+
+async def query_page(session_id, limit: int,
+               before: Optional[Tuple[str, str]] = None,
+               after: Optional[Tuple[str, str]] = None) -> List[dict]:
+    """
+    Una página de mensajes desde Supabase, en orden cronológico.
+    Sin cursores son los más nuevos; con `before`, los anteriores al cursor;
+    con `after`, los posteriores.
+    """
+    query = async_supabase.table("chat_messages").select(MESSAGE_COLUMNS).eq("session_id", str(session_id))
+    if after is not None:
+        timestamp, message_id = after
+        query = query.or_(
+            f'timestamp.gt."{timestamp}",and(timestamp.eq."{timestamp}",id.gt.{message_id})'
+        )
+        response = await query.order("timestamp").order("id").limit(limit).execute()
+        return response.data
+
+    if before is not None:
+        timestamp, message_id = before
+        query = query.or_(
+            f'timestamp.lt."{timestamp}",and(timestamp.eq."{timestamp}",id.lt.{message_id})'
+        )
+    response = await query.order("timestamp", desc=True).order("id", desc=True).limit(limit).execute()
+    return list(reversed(response.data))
@@ -0,0 +1,116 @@
+"""
+Persistencia diferida (write-behind) de los mensajes del chat.
+
+Con CHAT_WRITE_BEHIND activo, `send_message` no espera a Supabase: guarda el
+mensaje en una lista de Redis y lo publica en la misma transacción. Un hilo de
+fondo (`ChatMessageFlusher`) lo pasa a `chat_messages` en lotes, cuando junta
+CHAT_FLUSH_BATCH_SIZE mensajes o pasan CHAT_FLUSH_INTERVAL segundos.
+
+Cada mensaje se mueve de la lista pendiente a una lista "en proceso" antes
+de insertarlo y se borra de ahí recién cuando el insert confirmó. Si el
+proceso se cae en el medio, al arrancar se devuelven a la pendiente y se
+reinsertan: el insert es un upsert por `id`, así que repetirlo no duplica.
+"""
+import json
+import threading
+import time
+from typing import List
+
+from redis.exceptions import RedisError
+from core.config import settings
+from core.redis import redis_client
+from db.supabase_client import supabase
+
+PENDING_KEY = "chat_messages:pending"
+PROCESSING_KEY = "chat_messages:processing"
+# Espera máxima entre reintentos cuando falla el insert o Redis
+MAX_RETRY_DELAY = 30
+
+
+def enqueue_message(pipe, message_row: dict):
+    """Encola el mensaje para persistirlo, dentro de `pipe` (junto con su publicación)."""
+    pipe.lpush(PENDING_KEY, json.dumps(message_row))
+
+
+class ChatMessageFlusher:
+    def __init__(self,
+                 batch_size: int = settings.CHAT_FLUSH_BATCH_SIZE,
+                 interval: float = settings.CHAT_FLUSH_INTERVAL):
+        self.batch_size = batch_size
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="chat-flusher", daemon=True)
+
+    def start(self):
+        self.recover()
+        self._thread.start()
+
+    def stop(self, timeout: float = 10):
+        """Pide al hilo que termine; antes de salir vacía lo que quede pendiente."""
+        self._stop.set()
+        self._thread.join(timeout)
+
+    def recover(self) -> int:
+        """Devuelve a la lista pendiente los mensajes que quedaron a medio insertar."""
+        recovered = 0
+        while redis_client.lmove(PROCESSING_KEY, PENDING_KEY, "LEFT", "RIGHT") is not None:
+            recovered += 1
+        if recovered:
+            print(f"Se recuperaron {recovered} mensajes de chat sin persistir")
+        return recovered
+
+    def _run(self):
+        retry_delay = 1
+        while True:
+            stopping = self._stop.is_set()
+            try:
+                flushed = self.flush_once(wait=not stopping)
+                retry_delay = 1
+            except Exception as e:
+                # Los mensajes siguen en la lista "en proceso"; se reintentan después
+                print(f"Error al persistir mensajes de chat: {e}")
+                if stopping:
+                    return
+                self._stop.wait(retry_delay)
+                retry_delay = min(retry_delay * 2, MAX_RETRY_DELAY)
+                self.recover()
+                continue
+            if stopping and not flushed:
+                return
+
+    def _take_batch(self, wait: bool) -> List[str]:
+        batch: List[str] = []
+        if wait:
+            # Bloquea hasta que llega el primer mensaje (o vence el intervalo)
+            first = redis_client.blmove(PENDING_KEY, PROCESSING_KEY, self.interval, "RIGHT", "LEFT")
+            if first is None:
+                return batch
+            batch.append(first)
+        deadline = time.monotonic() + self.interval
+        while len(batch) < self.batch_size:
+            item = redis_client.lmove(PENDING_KEY, PROCESSING_KEY, "RIGHT", "LEFT")
+            if item is not None:
+                batch.append(item)
+                continue
+            if not wait or time.monotonic() >= deadline or self._stop.is_set():
+                break
+            time.sleep(min(0.05, self.interval))
+        return batch
+
+    def flush_once(self, wait: bool = True) -> int:
+        """Inserta un lote; devuelve cuántos mensajes persistió."""
+        batch = self._take_batch(wait)
+        if not batch:
+            return 0
+        rows = [json.loads(item) for item in batch]
+        supabase.table("chat_messages").upsert(rows, on_conflict="id").execute()
+
+        pipe = redis_client.pipeline(transaction=False)
+        for item in batch:
+            pipe.lrem(PROCESSING_KEY, 1, item)
+        try:
+            pipe.execute()
+        except RedisError as e:
+            # Ya están en la base; si se reinsertan, el upsert no los duplica
+            print(f"No se pudieron limpiar los mensajes ya persistidos: {e}")
+        return len(batch)
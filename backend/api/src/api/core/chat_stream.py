@@ -0,0 +1,78 @@
+"""
+Transporte del chat sobre Redis Streams (CHAT_TRANSPORT=streams).
+
+Cada mensaje se agrega a `chat_stream:{session_id}` (acotado a unos
+CHAT_STREAM_MAXLEN mensajes con MAXLEN ~) y se publica en el canal de la
+sesión con el id que le asignó el stream, en un solo script atómico. La
+entrega en vivo sigue usando la suscripción compartida del worker; el stream
+es el registro del que se repone lo que un cliente se perdió.
+
+Un cliente que se reconecta manda el último `stream_id` que vio y recibe el
+hueco con XRANGE antes de los mensajes en vivo. Si el hueco ya no está
+completo en el stream (o es más largo de lo que se repone), recibe
+`{"type": "resync"}` y debe pedir el historial paginado.
+"""
+import json
+import re
+from typing import List, Optional, Tuple
+
+from core.config import settings
+from core.redis import async_redis_client
+
+STREAM_KEY_PREFIX = "chat_stream:"
+STREAM_ID_PATTERN = re.compile(r"^\d+-\d+$")
+RESYNC_MESSAGE = json.dumps({"type": "resync"})
+
+# XADD + PUBLISH atómicos: el mensaje publicado lleva el id que le dio el stream
+_XADD_AND_PUBLISH = async_redis_client.register_script("""
+local stream_id = redis.call('XADD', KEYS[1], 'MAXLEN', '~', ARGV[1], '*', 'message', ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+local payload = string.sub(ARGV[2], 1, -2) .. ',"stream_id":"' .. stream_id .. '"}'
+redis.call('PUBLISH', KEYS[2], payload)
+return stream_id
+""")
+
+
+def stream_key(session_id) -> str:
+    return f"{STREAM_KEY_PREFIX}{session_id}"
+
+
+def parse_stream_id(stream_id: Optional[str]) -> Optional[Tuple[int, int]]:
+    """'1700000000000-0' -> (1700000000000, 0), para comparar ids; None si no es válido."""
+    if not stream_id or not STREAM_ID_PATTERN.match(stream_id):
+        return None
+    milliseconds, sequence = stream_id.split("-")
+    return int(milliseconds), int(sequence)
+
+
+async def append_and_publish(pipe, session_id, channel: str, payload: str):
+    """Agrega el mensaje (un objeto JSON) al stream de la sesión y lo publica, dentro de `pipe`."""
+    await _XADD_AND_PUBLISH(
+        keys=[stream_key(session_id), channel],
+        args=[settings.CHAT_STREAM_MAXLEN, payload, settings.CHAT_STREAM_TTL],
+        client=pipe,
+    )
+
+
+async def read_since(session_id, last_id: str, count: int) -> Optional[List[Tuple[str, str]]]:
+    """
+    Mensajes del stream posteriores a `last_id`, como (stream_id, payload), en
+    orden. None si no se puede reponer el hueco: el stream ya descartó
+    mensajes posteriores a `last_id` o hay más de `count`.
+    """
+    key = stream_key(session_id)
+    pipe = async_redis_client.pipeline(transaction=False)
+    pipe.xrange(key, min="-", max="+", count=1)
+    pipe.xrange(key, min=f"({last_id}", max="+", count=count + 1)
+    first, entries = await pipe.execute()
+
+    # Si el mensaje más viejo que queda es posterior al último visto, MAXLEN ya
+    # recortó algo del hueco
+    if first and parse_stream_id(first[0][0]) > parse_stream_id(last_id):
+        return None
+    if len(entries) > count:
+        return None
+    return [
+        (stream_id, json.dumps({**json.loads(fields["message"]), "stream_id": stream_id}))
+        for stream_id, fields in entries
+    ]
@@ -0,0 +1,83 @@
+"""
+Resolución de ciudadanos por DNI con caché de dos niveles.
+
+Primero se busca en un LRU del proceso (CITIZEN_LOCAL_TTL segundos), después
+en Redis (`citizen:dni:{dni}`, CITIZEN_CACHE_TTL segundos) y recién al final
+en Supabase. Si llegan varias búsquedas del mismo DNI a la vez, comparten una
+sola consulta. update_citizen y delete_citizen invalidan los dos niveles; en
+otros workers la copia local vence sola a los pocos segundos.
+"""
+import asyncio
+import json
+from typing import Dict, Optional
+
+from redis.exceptions import RedisError
+from core.config import settings
+from core.redis import async_redis_client
+from core.utils import TTLCache
+from db.supabase_client import async_supabase
+
+CITIZEN_KEY_PREFIX = "citizen:dni:"
+
+_local_cache = TTLCache(max_size=settings.CITIZEN_CACHE_SIZE, ttl_seconds=settings.CITIZEN_LOCAL_TTL)
+# Búsquedas en curso por DNI, para no repetir la misma consulta
+_inflight: Dict[str, asyncio.Task] = {}
+
+
+def citizen_key(dni: str) -> str:
+    return f"{CITIZEN_KEY_PREFIX}{dni}"
+
+
+async def resolve_citizen(dni: str) -> Optional[dict]:
+    """Devuelve la fila del ciudadano con ese DNI, o None si no existe."""
+    citizen = _local_cache.get(dni)
+    if citizen is not None:
+        return citizen
+
+    task = _inflight.get(dni)
+    if task is None:
+        task = asyncio.ensure_future(_load(dni))
+        _inflight[dni] = task
+        task.add_done_callback(lambda done: _inflight.pop(dni, None) if _inflight.get(dni) is done else None)
+    # shield: si se cancela un request, la consulta sigue para los demás que la esperan
+    return await asyncio.shield(task)
+
+
+async def _load(dni: str) -> Optional[dict]:
+    try:
+        cached = await async_redis_client.get(citizen_key(dni))
+    except RedisError as e:
+        print(f"No se pudo leer el ciudadano {dni} de la caché: {e}")
+        cached = None
+    if cached is not None:
+        citizen = json.loads(cached)
+        _store_local(dni, citizen)
+        return citizen
+
+    response = await async_supabase.table("citizens").select("*").eq("dni", dni).execute()
+    if not response.data:
+        return None
+    citizen = response.data[0]
+    # Si se invalidó mientras consultábamos, lo leído puede estar viejo: no se guarda
+    if _inflight.get(dni) is asyncio.current_task():
+        try:
+            await async_redis_client.set(citizen_key(dni), json.dumps(citizen), ex=settings.CITIZEN_CACHE_TTL)
+        except RedisError as e:
+            print(f"No se pudo guardar el ciudadano {dni} en la caché: {e}")
+        _local_cache.put(dni, citizen)
+    return citizen
+
+
+def _store_local(dni: str, citizen: dict):
+    if _inflight.get(dni) is asyncio.current_task():
+        _local_cache.put(dni, citizen)
+
+
+async def invalidate_citizen(dni: str):
+    """Descarta el ciudadano de los dos niveles de caché (y cualquier búsqueda en curso)."""
+    _inflight.pop(dni, None)
+    _local_cache.invalidate(dni)
+    try:
+        await async_redis_client.delete(citizen_key(dni))
+    except RedisError as e:
+        print(f"No se pudo invalidar el ciudadano {dni} en la caché: {e}")
@@ -1,3 +1,4 @@
+from typing import Optional
 from pydantic_settings import BaseSettings
 
 class Settings(BaseSettings):
@@ -8,6 +9,44 @@ class Settings(BaseSettings):
     SECRET_KEY: str
     ALGORITHM: str = "HS256"
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 30
+    # Auth: los JWT se validan localmente (ver core/security.py); con JWKS, en vez de SECRET_KEY
+    JWT_AUDIENCE: str = "authenticated"
+    SUPABASE_JWKS_URL: Optional[str] = None
+    JWKS_REFRESH_INTERVAL: int = 600
+    # Auth: perfiles de funcionarios en memoria, por id
+    OFFICIAL_CACHE_SIZE: int = 1024
+    OFFICIAL_CACHE_TTL: int = 60
+    # Ciudadanos por DNI: LRU del proceso (cantidad y segundos) y copia en Redis (segundos)
+    CITIZEN_CACHE_SIZE: int = 10000
+    CITIZEN_LOCAL_TTL: int = 30
+    CITIZEN_CACHE_TTL: int = 300
+    # Turnos: calendarios compilados de los trámites en memoria e índice de disponibilidad en Redis (ver core/availability.py)
+    PROCEDURE_CACHE_SIZE: int = 1024
+    PROCEDURE_CACHE_TTL: int = 60
+    AVAILABILITY_CACHE_TTL: int = 3600
+    # Turnos por página al armar el índice; no puede superar el db-max-rows de PostgREST (1000 por defecto)
+    AVAILABILITY_PAGE_SIZE: int = 1000
+    # Turnos: segundos que un ciudadano retiene una ventanilla de un slot mientras confirma (ver core/slot_holds.py)
+    TURNO_HOLD_TTL: int = 120
+    # Turnos: lista de espera; el worker ofrece los slots que se liberan, retenidos por TURNO_OFFER_TTL segundos (ver core/turno_waitlist.py)
+    TURNO_WAITLIST_WORKER: bool = True
+    TURNO_OFFER_TTL: int = 300
+    # Pool HTTP compartido por el cliente asíncrono de Supabase (ver db/supabase_client.py)
+    SUPABASE_POOL_SIZE: int = 100
+    SUPABASE_TIMEOUT: float = 10.0
+    SUPABASE_CONNECT_TIMEOUT: float = 5.0
+    SUPABASE_HTTP2: bool = True
+    # Chat: persistir los mensajes en segundo plano, por lotes (ver core/chat_persistence.py)
+    CHAT_WRITE_BEHIND: bool = False
+    CHAT_FLUSH_BATCH_SIZE: int = 100
+    CHAT_FLUSH_INTERVAL: float = 1.0
+    # Chat: últimos mensajes por sesión que se guardan en Redis, y por cuántos segundos
+    CHAT_HISTORY_CACHE_SIZE: int = 50
+    CHAT_HISTORY_CACHE_TTL: int = 86400
+    # Chat: "pubsub" o "streams" (con reposición de mensajes al reconectar, ver core/chat_stream.py)
+    CHAT_TRANSPORT: str = "pubsub"
+    CHAT_STREAM_MAXLEN: int = 1000
+    CHAT_STREAM_TTL: int = 86400
 
     class Config:
         env_file = "../../.env"
@@ -1,20 +1,27 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from db.supabase_client import supabase
+from core.config import settings
+from core.security import verify_token
+from core.utils import TTLCache
+from db.supabase_client import async_supabase
 from schemas.official import Official
 
 security = HTTPBearer()
 
+# Perfiles de funcionarios por id de usuario. update_official y delete_official
+# invalidan la entrada en este worker; en los demás vence a los OFFICIAL_CACHE_TTL segundos
+official_cache = TTLCache(max_size=settings.OFFICIAL_CACHE_SIZE, ttl_seconds=settings.OFFICIAL_CACHE_TTL)
+
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Official:
     """
     Dependencia para obtener el usuario actual a partir del token JWT de Supabase.
-    Verifica el token y busca los detalles del funcionario en la base de datos.
+    Verifica el token localmente y busca los detalles del funcionario, primero en la caché.
     """
     token = credentials.credentials
     try:
-        # Verifica el token con Supabase y obtiene los datos del usuario de auth.users
-        auth_user = supabase.auth.get_user(token)
-        user_id = auth_user.user.id
+        # Firma, vencimiento y audiencia se validan sin llamar al servidor de auth
+        claims = await verify_token(token)
+        user_id = claims["sub"]
     except Exception:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -22,8 +29,12 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+    official = official_cache.get(user_id)
+    if official is not None:
+        return official
+
     # Busca al funcionario en nuestra tabla pública usando el ID de auth.users
-    official_response = supabase.table("officials").select("*").eq("id", user_id).execute()
+    official_response = await async_supabase.table("officials").select("*").eq("id", user_id).execute()
     
     if not official_response.data:
         raise HTTPException(
@@ -31,7 +42,9 @@ async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(s
             detail="User not found in officials table"
         )
         
-    return Official(**official_response.data[0])
+    official = Official(**official_response.data[0])
+    official_cache.put(user_id, official)
+    return official
 
 async def get_current_admin(current_user: Official = Depends(get_current_user)) -> Official:
     """
@@ -1,4 +1,8 @@
 import redis
+import redis.asyncio as aioredis
 from core.config import settings
 
-redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
\ No newline at end of file
+redis_client = redis.from_url(settings.REDIS_URL, decode_responses=True)
+
+# Cliente asyncio para el WebSocket del chat: esperar mensajes no bloquea el event loop
+async_redis_client = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
@@ -0,0 +1,88 @@
+"""
+Verificación local de los JWT de Supabase.
+
+Por defecto los tokens se validan con SECRET_KEY y ALGORITHM (el JWT secret
+del proyecto). Si está configurado SUPABASE_JWKS_URL, se validan con las
+claves públicas del JWKS, que se guardan en memoria y se vuelven a pedir cada
+JWKS_REFRESH_INTERVAL segundos, o antes si llega un token firmado con una
+clave (`kid`) que todavía no conocemos. En ningún caso se consulta al
+servidor de auth por cada request.
+
+Los ciudadanos no tienen cuenta: para lo que es solo suyo (como las ofertas
+de la lista de espera) la API les firma un token propio con SECRET_KEY.
+"""
+import asyncio
+import time
+from datetime import datetime
+from typing import Dict, Optional
+
+from jose import jwt
+from jose.exceptions import JWTError
+from core.config import settings
+from db.supabase_client import http_client
+
+# Mínimo de segundos entre dos pedidos del JWKS por un `kid` desconocido
+JWKS_MIN_REFRESH_INTERVAL = 30
+# Los ciudadanos no tienen cuenta en Supabase: sus tokens los firma la API con SECRET_KEY
+CITIZEN_TOKEN_ALGORITHM = "HS256"
+
+
+class JWKSCache:
+    def __init__(self, url: str, refresh_interval: float):
+        self.url = url
+        self.refresh_interval = refresh_interval
+        self._keys: Dict[str, dict] = {}
+        self._fetched_at: Optional[float] = None
+        # Se crea con el primer pedido: en Python 3.9 un Lock creado al importar queda atado a otro loop
+        self._lock: Optional[asyncio.Lock] = None
+
+    async def get_key(self, kid: Optional[str]) -> dict:
+        if self._is_stale() or kid not in self._keys:
+            if self._lock is None:
+                self._lock = asyncio.Lock()
+            async with self._lock:
+                # Otro request pudo haberlo actualizado mientras esperábamos
+                if self._is_stale() or (kid not in self._keys and self._can_refresh()):
+                    await self._refresh()
+        if kid not in self._keys:
+            raise JWTError("Unknown signing key")
+        return self._keys[kid]
+
+    def _is_stale(self) -> bool:
+        return self._fetched_at is None or time.monotonic() - self._fetched_at > self.refresh_interval
+
+    def _can_refresh(self) -> bool:
+        return time.monotonic() - self._fetched_at > JWKS_MIN_REFRESH_INTERVAL
+
+    async def _refresh(self):
+        response = await http_client.get(self.url)
+        response.raise_for_status()
+        self._keys = {key["kid"]: key for key in response.json().get("keys", []) if "kid" in key}
+        self._fetched_at = time.monotonic()
+
+
+jwks_cache = (
+    JWKSCache(settings.SUPABASE_JWKS_URL, settings.JWKS_REFRESH_INTERVAL)
+    if settings.SUPABASE_JWKS_URL else None
+)
+
+
+async def verify_token(token: str) -> dict:
+    """Valida firma, vencimiento y audiencia del token; devuelve sus claims. JWTError si no es válido."""
+    if jwks_cache is None:
+        key, algorithm = settings.SECRET_KEY, settings.ALGORITHM
+    else:
+        key = await jwks_cache.get_key(jwt.get_unverified_header(token).get("kid"))
+        algorithm = key.get("alg", settings.ALGORITHM)
+    return jwt.decode(token, key, algorithms=[algorithm], audience=settings.JWT_AUDIENCE)
+
+
+def create_citizen_token(citizen_id, audience: str, expires_at: datetime) -> str:
+    """Un token para que el ciudadano use un recurso suyo (`audience`) hasta `expires_at`."""
+    claims = {"sub": str(citizen_id), "aud": audience, "exp": int(expires_at.timestamp())}
+    return jwt.encode(claims, settings.SECRET_KEY, algorithm=CITIZEN_TOKEN_ALGORITHM)
+
+
+def verify_citizen_token(token: str, audience: str) -> str:
+    """El citizen_id del token; JWTError si no es válido, venció o es para otro uso."""
+    return jwt.decode(token, settings.SECRET_KEY, algorithms=[CITIZEN_TOKEN_ALGORITHM], audience=audience)["sub"]
@@ -0,0 +1,89 @@
+"""
+Reservas temporales (holds) de slots de turnos en Redis.
+
+Antes de confirmar un turno, el ciudadano retiene una de las ventanillas
+libres del slot en `turno_hold:{procedure_id}:{horario}`, un sorted set con
+cada hold y su vencimiento. Un script purga los vencidos y agrega el nuevo
+solo si quedan ventanillas sin turno ni hold: cuando se agotan, los demás
+reciben un 409 al instante, sin llegar a la base. Cada hold vence a los
+TURNO_HOLD_TTL segundos si no se confirma. Al confirmar, create_turno
+verifica que el hold sigue vigente y lo libera después de guardar el turno.
+
+Los holds de las ofertas de la lista de espera son de un ciudadano: su
+citizen_id queda en `turno_hold_owner:{procedure_id}:{horario}` y solo él
+puede confirmar el turno con ese hold.
+"""
+import time
+from datetime import datetime
+from typing import Optional
+from uuid import UUID, uuid4
+
+from core.availability import to_utc_naive
+from core.config import settings
+from core.redis import async_redis_client
+
+HOLD_KEY_PREFIX = "turno_hold:"
+OWNER_KEY_PREFIX = "turno_hold_owner:"
+
+# Agrega el hold si, sacando los vencidos, hay menos holds que ventanillas libres.
+# La clave vence con el hold que vence último: uno más corto no acorta a los demás
+_ACQUIRE_IF_FREE = async_redis_client.register_script("""
+redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', ARGV[1])
+if redis.call('ZCARD', KEYS[1]) >= tonumber(ARGV[2]) then
+    return 0
+end
+redis.call('ZADD', KEYS[1], ARGV[3], ARGV[4])
+local last = redis.call('ZRANGE', KEYS[1], -1, -1, 'WITHSCORES')
+redis.call('PEXPIREAT', KEYS[1], last[2])
+if ARGV[5] ~= '' then
+    redis.call('HSET', KEYS[2], ARGV[4], ARGV[5])
+    redis.call('PEXPIREAT', KEYS[2], last[2])
+end
+return 1
+""")
+
+
+def hold_key(procedure_id: UUID, scheduled_at: datetime) -> str:
+    return f"{HOLD_KEY_PREFIX}{procedure_id}:{to_utc_naive(scheduled_at).isoformat()}"
+
+
+def owner_key(procedure_id: UUID, scheduled_at: datetime) -> str:
+    return f"{OWNER_KEY_PREFIX}{procedure_id}:{to_utc_naive(scheduled_at).isoformat()}"
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+async def acquire_hold(procedure_id: UUID, scheduled_at: datetime, free_desks: int,
+                       ttl_seconds: int = settings.TURNO_HOLD_TTL,
+                       citizen_id: Optional[UUID] = None) -> Optional[str]:
+    """
+    Retiene una de las `free_desks` ventanillas sin turno; devuelve el id del
+    hold, o None si están todas retenidas. Con `citizen_id`, el hold es solo suyo.
+    """
+    if free_desks <= 0:
+        return None
+    hold_id = str(uuid4())
+    now = _now_ms()
+    acquired = await _ACQUIRE_IF_FREE(
+        keys=[hold_key(procedure_id, scheduled_at), owner_key(procedure_id, scheduled_at)],
+        args=[now, free_desks, now + ttl_seconds * 1000, hold_id, str(citizen_id) if citizen_id else ""],
+    )
+    return hold_id if acquired else None
+
+
+async def owns_hold(procedure_id: UUID, scheduled_at: datetime, hold_id: str, citizen_id: UUID) -> bool:
+    """Si el hold sigue vigente y el ciudadano puede usarlo: es suyo o no es de nadie."""
+    pipe = async_redis_client.pipeline(transaction=False)
+    pipe.zscore(hold_key(procedure_id, scheduled_at), hold_id)
+    pipe.hget(owner_key(procedure_id, scheduled_at), hold_id)
+    expires_at, owner = await pipe.execute()
+    return expires_at is not None and expires_at > _now_ms() and owner in (None, str(citizen_id))
+
+
+async def release_hold(procedure_id: UUID, scheduled_at: datetime, hold_id: str):
+    pipe = async_redis_client.pipeline(transaction=False)
+    pipe.zrem(hold_key(procedure_id, scheduled_at), hold_id)
+    pipe.hdel(owner_key(procedure_id, scheduled_at), hold_id)
+    await pipe.execute()
@@ -0,0 +1,89 @@
+"""
+Normalización de texto en español para las búsquedas por palabra clave.
+Pasos: minúsculas, plegado de tildes (NFKD), eliminación de stopwords y un
+stemmer liviano estilo Snowball (plurales, género, infinitivos y algunos
+sufijos derivativos). Los textos del catálogo se normalizan una sola vez y
+las consultas se cachean por texto.
+
+Es una copia de `actions/text_normalizer.py` del bot (rasa-chat): si se
+cambia uno hay que cambiar el otro. `tests/test_text_normalizer.py` compara
+las dos sobre las FAQs del bot y falla si dan resultados distintos.
+"""
+
+import re
+import unicodedata
+from functools import lru_cache
+from typing import List, Text, Tuple
+
+TOKEN_PATTERN = re.compile(r'\b\w{3,}\b')
+
+# Stopwords del español, ya sin tildes
+STOPWORDS = frozenset("""
+a al algo algun alguna algunas alguno algunos ante antes aqui asi aun bien
+cada casi como con contra cual cuales cuando cuanto de del desde donde dos
+el ella ellas ellos en entre era eran es esa esas ese eso esos esta estaba
+estan estar estas este esto estos fue fueron ha hace hacer hay hasta la las
+le les lo los mas me mi mis mucho muy nada ni no nos nosotros o otra otras
+otro otros para pero poco por porque puede pueden puedo que quien se sea
+segun ser si sin sobre solo son su sus tambien tan tanto te tengo tiene
+tienen todo todos tu tus un una unas uno unos usted ustedes ya yo
+quiero necesito hola gracias favor
+""".split())
+
+# Sufijos derivativos, del más largo al más corto
+DERIVATIONAL_SUFFIXES = (
+    'amientos', 'imientos', 'aciones', 'iciones', 'uciones', 'amiento',
+    'imiento', 'idades', 'ciones', 'siones', 'mente', 'acion', 'icion',
+    'ucion', 'idad', 'cion', 'sion',
+)
+# Consonantes tras las que el plural agrega "es" (ciudad-es, papel-es, mes-es)
+PLURAL_ES_CONSONANTS = frozenset('lrndzjs')
+MIN_STEM_LENGTH = 3
+
+
+def fold_accents(text: Text) -> Text:
+    """Pasa a minúsculas y elimina tildes y diéresis ("Trámite" -> "tramite")."""
+    decomposed = unicodedata.normalize('NFKD', text.lower())
+    return "".join(char for char in decomposed if not unicodedata.combining(char))
+
+
+@lru_cache(maxsize=50000)
+def stem(word: Text) -> Text:
+    """Stemmer liviano: "licencias" -> "licenci", "habilitación" -> "habilit"."""
+    for suffix in DERIVATIONAL_SUFFIXES:
+        if word.endswith(suffix) and len(word) - len(suffix) >= MIN_STEM_LENGTH + 1:
+            return word[:-len(suffix)]
+
+    if word.endswith('es') and len(word) - 2 >= MIN_STEM_LENGTH + 1 \
+            and word[-3] in PLURAL_ES_CONSONANTS:
+        word = word[:-2]
+    elif word.endswith('s') and len(word) - 1 >= MIN_STEM_LENGTH:
+        word = word[:-1]
+
+    if word.endswith(('ar', 'er', 'ir')) and len(word) - 2 >= MIN_STEM_LENGTH:
+        return word[:-2]
+    if word[-1] in 'aeo' and len(word) - 1 >= MIN_STEM_LENGTH:
+        return word[:-1]
+    return word
+
+
+def clean_text(text: Text) -> Text:
+    """Texto plegado y sin stopwords pero sin stemming, para los n-gramas de caracteres."""
+    return " ".join(
+        token for token in TOKEN_PATTERN.findall(fold_accents(text))
+        if token not in STOPWORDS
+    )
+
+
+def normalize(text: Text) -> List[Text]:
+    """Devuelve los términos normalizados del texto, sin stopwords."""
+    return [
+        stem(token) for token in TOKEN_PATTERN.findall(fold_accents(text))
+        if token not in STOPWORDS
+    ]
+
+
+@lru_cache(maxsize=10000)
+def normalize_query(text: Text) -> Tuple[Text, ...]:
+    """Igual que `normalize`, cacheado por texto de consulta."""
+    return tuple(normalize(text))
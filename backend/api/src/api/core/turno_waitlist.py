@@ -0,0 +1,206 @@
+"""
+Lista de espera de turnos y aviso de los slots que se liberan.
+
+Cada trámite y día tiene su lista de espera en Redis
+(`turno_waitlist:{procedure_id}:{fecha}`), un sorted set de ciudadanos por
+orden de llegada: el puntaje sale de un contador de la lista
+(`turno_waitlist:seq:{procedure_id}:{fecha}`), así dos que se anotan en el
+mismo milisegundo no quedan empatados. Cuando se cancela un turno, `cancel_turno` encola el slot
+liberado en `turno_releases:pending`; el `SlotReleaseWorker` lo toma (pasándolo
+a una lista "en proceso", como el flusher del chat) y, si el slot sigue con
+una ventanilla libre, se lo ofrece al primero de la lista: le retiene la
+ventanilla por TURNO_OFFER_TTL segundos y publica la oferta en
+`turno_channel:{citizen_id}`, que los clientes escuchan por WebSocket en vez
+de consultar la disponibilidad (con el token que reciben al anotarse). El hold
+de la oferta es solo de ese ciudadano. La oferta también queda en
+`turno_offer:{citizen_id}` para el que se conecta después.
+
+Cuando vence la oferta, el slot vuelve a la cola: si el ciudadano no
+confirmó, se le ofrece al siguiente.
+"""
+import asyncio
+import json
+import logging
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Optional
+from uuid import UUID
+
+from redis.exceptions import RedisError
+from core.availability import parse_timestamp, procedure_schedule, slot_bookings, to_utc_naive
+from core.config import settings
+from core.redis import async_redis_client
+from core.slot_holds import acquire_hold
+
+WAITLIST_KEY_PREFIX = "turno_waitlist:"
+OFFER_KEY_PREFIX = "turno_offer:"
+TURNO_CHANNEL_PREFIX = "turno_channel:"
+# Audiencia del token que habilita el WebSocket de ofertas de un ciudadano
+OFFERS_TOKEN_AUDIENCE = "turno_offers"
+PENDING_KEY = "turno_releases:pending"
+PROCESSING_KEY = "turno_releases:processing"
+# Slots a revisar de nuevo cuando vence su oferta, con el vencimiento como puntaje
+DELAYED_KEY = "turno_releases:delayed"
+# Segundos que espera el worker por un slot liberado antes de revisar los diferidos
+POLL_INTERVAL = 1
+# Espera máxima entre reintentos cuando falla Redis
+MAX_RETRY_DELAY = 30
+
+logger = logging.getLogger(__name__)
+
+# Anota al ciudadano al final de la lista, si no estaba, y devuelve su posición (desde 0)
+_JOIN = async_redis_client.register_script("""
+if not redis.call('ZSCORE', KEYS[1], ARGV[1]) then
+    redis.call('ZADD', KEYS[1], redis.call('INCR', KEYS[2]), ARGV[1])
+end
+redis.call('EXPIREAT', KEYS[1], ARGV[2])
+redis.call('EXPIREAT', KEYS[2], ARGV[2])
+return redis.call('ZRANK', KEYS[1], ARGV[1])
+""")
+
+# Pasa a la cola los slots diferidos que ya vencieron
+_PROMOTE_DUE = async_redis_client.register_script("""
+local due = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, 100)
+for _, item in ipairs(due) do
+    redis.call('ZREM', KEYS[1], item)
+    redis.call('LPUSH', KEYS[2], item)
+end
+return #due
+""")
+
+
+def waitlist_key(procedure_id, day: date) -> str:
+    return f"{WAITLIST_KEY_PREFIX}{procedure_id}:{day.isoformat()}"
+
+
+def waitlist_expiry(day: date) -> datetime:
+    """La lista de un día no sirve después de ese día."""
+    return datetime.combine(day + timedelta(days=1), datetime.min.time(), tzinfo=timezone.utc)
+
+
+def _sequence_key(procedure_id, day: date) -> str:
+    return f"{WAITLIST_KEY_PREFIX}seq:{procedure_id}:{day.isoformat()}"
+
+
+def offer_key(citizen_id) -> str:
+    return f"{OFFER_KEY_PREFIX}{citizen_id}"
+
+
+def _now_ms() -> int:
+    return int(time.time() * 1000)
+
+
+async def join_waitlist(procedure_id: UUID, day: date, citizen_id: UUID) -> int:
+    """Anota al ciudadano (si no estaba) y devuelve su lugar en la lista, desde 1."""
+    rank = await _JOIN(keys=[waitlist_key(procedure_id, day), _sequence_key(procedure_id, day)],
+                       args=[str(citizen_id), int(waitlist_expiry(day).timestamp())])
+    return rank + 1
+
+
+async def leave_waitlist(procedure_id: UUID, day: date, citizen_id: UUID) -> bool:
+    return bool(await async_redis_client.zrem(waitlist_key(procedure_id, day), str(citizen_id)))
+
+
+async def pending_offer(citizen_id: UUID) -> Optional[str]:
+    """La última oferta vigente del ciudadano, tal como se publicó."""
+    return await async_redis_client.get(offer_key(citizen_id))
+
+
+async def publish_release(procedure_id, scheduled_at):
+    """Encola el slot de un turno cancelado para ofrecérselo a la lista de espera."""
+    if isinstance(scheduled_at, str):
+        scheduled_at = parse_timestamp(scheduled_at)
+    event = json.dumps({"procedure_id": str(procedure_id), "scheduled_at": to_utc_naive(scheduled_at).isoformat()})
+    try:
+        await async_redis_client.lpush(PENDING_KEY, event)
+    except RedisError as e:
+        # La cancelación ya está guardada; el slot sigue visible en available-slots
+        logger.warning("No se pudo avisar la liberación del slot del trámite %s: %s", procedure_id, e)
+
+
+class SlotReleaseWorker:
+    def __init__(self, offer_ttl: int = settings.TURNO_OFFER_TTL):
+        self.offer_ttl = offer_ttl
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        await self.recover()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Corta el worker; lo que quedó en proceso se retoma en el próximo arranque."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def recover(self) -> int:
+        """Devuelve a la cola los slots que quedaron a medio procesar."""
+        recovered = 0
+        while await async_redis_client.lmove(PROCESSING_KEY, PENDING_KEY, "LEFT", "RIGHT") is not None:
+            recovered += 1
+        if recovered:
+            logger.info("Se recuperaron %d slots liberados sin procesar", recovered)
+        return recovered
+
+    async def _run(self):
+        retry_delay = 1
+        while True:
+            try:
+                await self.process_once()
+                retry_delay = 1
+            except Exception as e:
+                logger.exception("Error al procesar slots liberados: %s", e)
+                await asyncio.sleep(retry_delay)
+                retry_delay = min(retry_delay * 2, MAX_RETRY_DELAY)
+                await self.recover()
+
+    async def process_once(self, timeout: float = POLL_INTERVAL) -> bool:
+        """Procesa un slot liberado, si llega uno antes de `timeout`; devuelve si procesó alguno."""
+        await _PROMOTE_DUE(keys=[DELAYED_KEY, PENDING_KEY], args=[_now_ms()])
+        item = await async_redis_client.blmove(PENDING_KEY, PROCESSING_KEY, timeout, "RIGHT", "LEFT")
+        if item is None:
+            return False
+        event = json.loads(item)
+        await self.offer_slot(event["procedure_id"], datetime.fromisoformat(event["scheduled_at"]))
+        await async_redis_client.lrem(PROCESSING_KEY, 1, item)
+        return True
+
+    async def offer_slot(self, procedure_id: str, scheduled_at: datetime) -> Optional[str]:
+        """Ofrece el slot al primero de la lista de espera si tiene una ventanilla libre; devuelve a quién."""
+        if scheduled_at <= datetime.now(timezone.utc).replace(tzinfo=None):
+            return None
+        schedule = await procedure_schedule(procedure_id)
+        if schedule is None:
+            return None
+        bookings = await slot_bookings(procedure_id, schedule, scheduled_at)
+        if bookings is None or bookings >= schedule.desks:
+            return None
+
+        key = waitlist_key(procedure_id, scheduled_at.date())
+        popped = await async_redis_client.zpopmin(key)
+        if not popped:
+            return None
+        citizen_id, joined_at = popped[0]
+        hold_id = await acquire_hold(procedure_id, scheduled_at, schedule.desks - bookings,
+                                     ttl_seconds=self.offer_ttl, citizen_id=citizen_id)
+        if hold_id is None:
+            # Las ventanillas libres están retenidas por otros: el ciudadano vuelve a su lugar
+            await async_redis_client.zadd(key, {citizen_id: joined_at})
+            return None
+
+        expires_at = datetime.now(timezone.utc) + timedelta(seconds=self.offer_ttl)
+        offer = json.dumps({
+            "type": "slot_offer",
+            "procedure_id": procedure_id,
+            "scheduled_at": scheduled_at.isoformat(),
+            "hold_id": hold_id,
+            "expires_at": expires_at.isoformat(),
+        })
+        recheck = json.dumps({"procedure_id": procedure_id, "scheduled_at": scheduled_at.isoformat(), "hold_id": hold_id})
+        pipe = async_redis_client.pipeline(transaction=True)
+        pipe.set(offer_key(citizen_id), offer, ex=self.offer_ttl)
+        pipe.publish(f"{TURNO_CHANNEL_PREFIX}{citizen_id}", offer)
+        pipe.zadd(DELAYED_KEY, {recheck: int(expires_at.timestamp() * 1000)})
+        await pipe.execute()
+        return citizen_id
@@ -0,0 +1,21 @@
+from fastapi import HTTPException
+from db.supabase_client import async_supabase
+
+
+async def update_or_404(table: str, column: str, value, values: dict, detail: str) -> dict:
+    """
+    Actualiza la fila donde `column` = `value` y la devuelve, en una sola
+    llamada: si el update no devuelve filas, la fila no existe (404).
+    """
+    response = await async_supabase.table(table).update(values).eq(column, value).execute()
+    if not response.data:
+        raise HTTPException(status_code=404, detail=detail)
+    return response.data[0]
+
+
+async def delete_or_404(table: str, column: str, value, detail: str) -> dict:
+    """Borra la fila donde `column` = `value` y la devuelve; 404 si no había ninguna."""
+    response = await async_supabase.table(table).delete().eq(column, value).execute()
+    if not response.data:
+        raise HTTPException(status_code=404, detail=detail)
+    return response.data[0]
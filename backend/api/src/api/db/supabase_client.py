@@ -1,7 +1,9 @@
-from supabase import create_client
-from supabase.lib.client_options import ClientOptions
+import httpx
+from supabase import AsyncClient, create_client
+from supabase.lib.client_options import AsyncClientOptions, ClientOptions
 from core.config import settings
 
+# Cliente síncrono: lo usan los hilos de fondo (flusher del chat) y los scripts
 supabase = create_client(
     settings.SUPABASE_URL, 
     settings.SUPABASE_SERVICE_ROLE_KEY,
@@ -10,4 +12,32 @@ supabase = create_client(
         persist_session=False,    
     ))
 
-admin_auth_client = supabase.auth.admin
\ No newline at end of file
+admin_auth_client = supabase.auth.admin
+
+# Cliente asíncrono para los endpoints: PostgREST y auth comparten un único pool
+# HTTP/2, así que la concurrencia de un worker la limita la red y no el threadpool
+http_client = httpx.AsyncClient(
+    http2=settings.SUPABASE_HTTP2,
+    follow_redirects=True,
+    limits=httpx.Limits(
+        max_connections=settings.SUPABASE_POOL_SIZE,
+        max_keepalive_connections=settings.SUPABASE_POOL_SIZE,
+    ),
+    timeout=httpx.Timeout(settings.SUPABASE_TIMEOUT, connect=settings.SUPABASE_CONNECT_TIMEOUT),
+)
+
+async_supabase = AsyncClient(
+    settings.SUPABASE_URL,
+    settings.SUPABASE_SERVICE_ROLE_KEY,
+    options=AsyncClientOptions(
+        auto_refresh_token=False,
+        persist_session=False,
+        httpx_client=http_client,
+    ))
+
+async_admin_auth_client = async_supabase.auth.admin
+
+
+async def close_async_supabase():
+    """Cierra las conexiones del pool compartido (al apagar la app)."""
+    await http_client.aclose()
@@ -0,0 +1,46 @@
+from fastapi import APIRouter, HTTPException, status
+from typing import List
+from uuid import UUID
+from core.availability import invalidate_schedules
+from db.mutations import delete_or_404, update_or_404
+from db.supabase_client import async_supabase
+from schemas.calendar import OfficeCalendar, OfficeCalendarCreate, OfficeCalendarUpdate
+
+router = APIRouter(prefix="/calendars", tags=["Calendars"])
+
+@router.post("/", response_model=OfficeCalendar, status_code=status.HTTP_201_CREATED)
+async def create_calendar(calendar: OfficeCalendarCreate):
+    """
+    Crea el calendario de atención de un departamento o de un trámite: horarios
+    por día de la semana, feriados y ventanillas que atienden en paralelo.
+    """
+    response = await async_supabase.table("office_calendars").insert(calendar.model_dump(mode="json")).execute()
+    if not response.data:
+        raise HTTPException(status_code=400, detail="Error creating calendar")
+    invalidate_schedules()
+    return response.data[0]
+
+@router.get("/", response_model=List[OfficeCalendar])
+async def read_calendars(skip: int = 0, limit: int = 100):
+    response = await async_supabase.table("office_calendars").select("*").range(skip, skip + limit - 1).execute()
+    return response.data
+
+@router.get("/{calendar_id}", response_model=OfficeCalendar)
+async def read_calendar(calendar_id: UUID):
+    response = await async_supabase.table("office_calendars").select("*").eq("id", calendar_id).execute()
+    if not response.data:
+        raise HTTPException(status_code=404, detail="Calendar not found")
+    return response.data[0]
+
+@router.put("/{calendar_id}", response_model=OfficeCalendar)
+async def update_calendar(calendar_id: UUID, calendar_update: OfficeCalendarUpdate):
+    calendar = await update_or_404("office_calendars", "id", calendar_id, calendar_update.model_dump(mode="json", exclude_unset=True), "Calendar not found")
+    invalidate_schedules()
+    return calendar
+
+@router.delete("/{calendar_id}")
+async def delete_calendar(calendar_id: UUID):
+    """Elimina el calendario; sus trámites pasan a usar el de su departamento o el horario por defecto."""
+    await delete_or_404("office_calendars", "id", calendar_id, "Calendar not found")
+    invalidate_schedules()
+    return {"message": "Calendar deleted successfully"}
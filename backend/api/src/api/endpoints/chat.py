@@ -1,90 +1,308 @@
+import asyncio
 import json
-from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
-from typing import List
-from uuid import UUID
-from db.supabase_client import supabase
-from core.redis import redis_client
-from schemas.chat import Message, MessageCreate
+from fastapi import APIRouter, Depends, HTTPException, Query, WebSocket, WebSocketDisconnect
+from typing import List, Optional
+from datetime import datetime, timezone
+from uuid import UUID, uuid4
+from db.supabase_client import async_supabase
+from redis.exceptions import RedisError
+from core.chat_history import cache_message, cached_latest, decode_cursor, encode_cursor, fill_cache, query_page
+from core.chat_persistence import enqueue_message
+from core.chat_stream import RESYNC_MESSAGE, append_and_publish, parse_stream_id, read_since
+from core.citizen_cache import resolve_citizen
+from core.config import settings
+from core.redis import async_redis_client
+from schemas.chat import Message, MessageCreate, MessagePage
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
+CHAT_CHANNEL_PREFIX = "chat_channel:"
+# Segundos que espera connect() a que la suscripción compartida esté activa
+SUBSCRIBE_TIMEOUT = 5
+# Espera antes de reintentar si se corta la conexión con Redis
+RECONNECT_DELAY = 1
+# Mensajes pendientes por socket; si un cliente acumula más, se lo desconecta
+OUTBOUND_QUEUE_SIZE = 100
+# Segundos que puede tardar un socket en aceptar un mensaje antes de desconectarlo
+SEND_TIMEOUT = 10
+# Código de cierre para clientes lentos: "Try Again Later"
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+class ClientConnection:
+    """Un socket de una sesión, con su cola de salida acotada y su propia tarea de envío."""
+
+    def __init__(self, websocket: WebSocket, last_stream_id: Optional[tuple] = None):
+        self.websocket = websocket
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=OUTBOUND_QUEUE_SIZE)
+        self.writer = asyncio.create_task(self._write())
+        # Último mensaje del stream entregado, para no repetir lo que ya se repuso
+        self.last_stream_id = last_stream_id
+        # Mientras se repone un hueco, los mensajes en vivo esperan acá
+        self._held: Optional[list] = [] if last_stream_id is not None else None
+
+    def enqueue(self, message: str, stream_id: Optional[tuple] = None) -> bool:
+        """Encola sin esperar; devuelve False si la cola del cliente está llena."""
+        if self._held is not None:
+            self._held.append((message, stream_id))
+            return len(self._held) <= OUTBOUND_QUEUE_SIZE
+        return self._put(message, stream_id)
+
+    def resume(self, replayed: List[tuple]) -> bool:
+        """Encola el hueco repuesto y después lo que llegó en vivo mientras tanto."""
+        held, self._held = self._held or [], None
+        return all(self._put(message, stream_id) for message, stream_id in replayed + held)
+
+    def _put(self, message: str, stream_id: Optional[tuple]) -> bool:
+        if stream_id is not None:
+            if self.last_stream_id is not None and stream_id <= self.last_stream_id:
+                return True
+            self.last_stream_id = stream_id
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            return False
+        return True
+
+    async def _write(self):
+        while True:
+            message = await self.queue.get()
+            await asyncio.wait_for(self.websocket.send_text(message), SEND_TIMEOUT)
+
+    async def close(self, code: int):
+        self.writer.cancel()
+        try:
+            await self.websocket.close(code=code)
+        except Exception:
+            # El socket ya puede estar cerrado del otro lado
+            pass
+
 class ConnectionManager:
-    def __init__(self):
-        self.active_connections: dict[UUID, WebSocket] = {}
+    def __init__(self, channel_prefix: str = CHAT_CHANNEL_PREFIX):
+        # Los canales son {channel_prefix}{uuid}; el chat usa uno por sesión
+        self.channel_prefix = channel_prefix
+        # Todos los sockets abiertos de cada sesión (por ejemplo, ciudadano y funcionario)
+        self.active_connections: dict[UUID, set[ClientConnection]] = {}
+        # Una sola suscripción por patrón (chat_channel:*) para todas las sesiones del worker
+        self._listener: Optional[asyncio.Task] = None
+        # Se crea con el listener: en Python 3.9 un Event creado al importar queda atado a otro loop
+        self._subscribed: Optional[asyncio.Event] = None
+        self._closing: set[asyncio.Task] = set()
 
-    async def connect(self, websocket: WebSocket, session_id: UUID):
+    async def connect(self, websocket: WebSocket, session_id: UUID,
+                      last_stream_id: Optional[str] = None) -> ClientConnection:
+        """
+        Registra el socket. Con el transporte de streams y un `last_stream_id`,
+        antes de pasar a vivo le repone lo que se perdió desde ese mensaje.
+        """
         await websocket.accept()
-        self.active_connections[session_id] = websocket
+        replay_from = parse_stream_id(last_stream_id) if settings.CHAT_TRANSPORT == "streams" else None
+        connection = ClientConnection(websocket, replay_from)
+        connection.writer.add_done_callback(
+            lambda task: self._on_writer_done(task, session_id, connection)
+        )
+        self.active_connections.setdefault(session_id, set()).add(connection)
+        await self.start_listener()
         print(f"Cliente conectado a la sesión {session_id}")
+        if replay_from is not None:
+            await self._replay(session_id, connection, last_stream_id)
+        return connection
+
+    async def _replay(self, session_id: UUID, connection: ClientConnection, last_stream_id: str):
+        try:
+            entries = await read_since(session_id, last_stream_id, OUTBOUND_QUEUE_SIZE)
+        except RedisError as e:
+            print(f"No se pudo reponer el chat de la sesión {session_id}: {e}")
+            entries = None
+        if entries is None:
+            # El hueco no se puede reponer entero: el cliente pide el historial
+            replayed = [(RESYNC_MESSAGE, None)]
+        else:
+            replayed = [(payload, parse_stream_id(stream_id)) for stream_id, payload in entries]
+        if not connection.resume(replayed):
+            self._drop(session_id, connection)
 
-    def disconnect(self, session_id: UUID):
-        if session_id in self.active_connections:
-            del self.active_connections[session_id]
-        print(f"Cliente desconectado de la sesión {session_id}")
+    def disconnect(self, session_id: UUID, connection: ClientConnection):
+        connections = self.active_connections.get(session_id)
+        if connections is not None and connection in connections:
+            connections.discard(connection)
+            if not connections:
+                del self.active_connections[session_id]
+            connection.writer.cancel()
+            print(f"Cliente desconectado de la sesión {session_id}")
 
     async def send_personal_message(self, message: str, session_id: UUID):
-        if session_id in self.active_connections:
-            websocket = self.active_connections[session_id]
-            await websocket.send_text(message)
+        self.broadcast(message, session_id)
+
+    def broadcast(self, message: str, session_id: UUID):
+        """
+        Encola el mensaje en cada socket de la sesión; cada uno lo envía desde su
+        propia tarea, así que los envíos corren en paralelo. Un cliente con la
+        cola llena se desconecta en lugar de frenar a los demás.
+        """
+        connections = self.active_connections.get(session_id)
+        if not connections:
+            return
+        stream_id = None
+        if settings.CHAT_TRANSPORT == "streams":
+            try:
+                stream_id = parse_stream_id(json.loads(message).get("stream_id"))
+            except (json.JSONDecodeError, AttributeError):
+                pass
+        for connection in list(connections):
+            if not connection.enqueue(message, stream_id):
+                print(f"Cliente lento en la sesión {session_id}: se lo desconecta")
+                self._drop(session_id, connection)
+
+    def _on_writer_done(self, task: asyncio.Task, session_id: UUID, connection: ClientConnection):
+        # Si el envío falló o tardó demasiado, el socket ya no sirve
+        if not task.cancelled() and task.exception() is not None:
+            self._drop(session_id, connection)
+
+    def _drop(self, session_id: UUID, connection: ClientConnection):
+        self.disconnect(session_id, connection)
+        task = asyncio.create_task(connection.close(SLOW_CONSUMER_CLOSE_CODE))
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def start_listener(self):
+        """Arranca el listener compartido (si no corre) y espera a que esté suscripto."""
+        if self._subscribed is None:
+            self._subscribed = asyncio.Event()
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+        try:
+            await asyncio.wait_for(self._subscribed.wait(), SUBSCRIBE_TIMEOUT)
+        except asyncio.TimeoutError:
+            print("La suscripción a Redis todavía no está activa; se reintenta en segundo plano")
+
+    async def stop_listener(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            await asyncio.gather(self._listener, return_exceptions=True)
+            self._listener = None
+
+    async def _listen(self):
+        while True:
+            pubsub = async_redis_client.pubsub()
+            try:
+                await pubsub.psubscribe(f"{self.channel_prefix}*")
+                self._subscribed.set()
+                async for message in pubsub.listen():
+                    if message["type"] == "pmessage":
+                        self.dispatch(message["channel"], message["data"])
+            except RedisError as e:
+                print(f"Se perdió la suscripción a {self.channel_prefix}* en Redis: {e}")
+            finally:
+                self._subscribed.clear()
+                await pubsub.aclose()
+            await asyncio.sleep(RECONNECT_DELAY)
+
+    def dispatch(self, channel: str, data: str):
+        """Entrega un mensaje publicado en {channel_prefix}{session_id} a su socket, si está en este worker."""
+        try:
+            session_id = UUID(channel[len(self.channel_prefix):])
+        except ValueError:
+            return
+        self.broadcast(data, session_id)
 
 manager = ConnectionManager()
 
 @router.post("/sessions", status_code=201)
-def create_chat_session(citizen_dni: str, ticket_id: UUID = None):
-    citizen = supabase.table("citizens").select("id").eq("dni", citizen_dni).execute()
-    if not citizen.data:
+async def create_chat_session(citizen_dni: str, ticket_id: UUID = None):
+    citizen = await resolve_citizen(citizen_dni)
+    if citizen is None:
         raise HTTPException(status_code=404, detail="Citizen not found")
     
     session_data = {
-        "citizen_id": citizen.data[0]["id"],
+        "citizen_id": citizen["id"],
         "ticket_id": str(ticket_id) if ticket_id else None
     }
-    response = supabase.table("chat_sessions").insert(session_data).execute()
+    response = await async_supabase.table("chat_sessions").insert(session_data).execute()
     if not response.data:
         raise HTTPException(status_code=400, detail="Error creating chat session")
     return response.data[0]
 
 @router.post("/sessions/{session_id}/messages", response_model=Message)
-def send_message(session_id: UUID, message: MessageCreate):
-    # 1. Guardar en Supabase para persistencia
-    message_data = message.model_dump()
+async def send_message(session_id: UUID, message: MessageCreate):
+    message_data = message.model_dump(mode="json")
     message_data['session_id'] = str(session_id)
-    response = supabase.table("chat_messages").insert(message_data).execute()
+
+    if settings.CHAT_WRITE_BEHIND:
+        # El id y el timestamp los genera el servidor; Supabase recibe el mensaje
+        # después, en el próximo lote del flusher
+        message_data['id'] = str(uuid4())
+        message_data['timestamp'] = datetime.now(timezone.utc).isoformat()
+        pipe = async_redis_client.pipeline(transaction=True)
+        enqueue_message(pipe, message_data)
+        await _publish(pipe, message_data)
+        await pipe.execute()
+        return message_data
+
+    # 1. Guardar en Supabase para persistencia
+    response = await async_supabase.table("chat_messages").insert(message_data).execute()
     if not response.data:
         raise HTTPException(status_code=400, detail="Error sending message")
     
-    # 2. Publicar en Redis para notificación en tiempo real
-    redis_message = json.dumps({
-        "sender_id": str(message.sender_id),
-        "sender_type": message.sender_type,
-        "content": message.content,
-        "timestamp": response.data[0]["timestamp"]
-    })
-    redis_client.publish(f"chat_channel:{session_id}", redis_message)
+    # 2. Publicar en Redis para notificación en tiempo real (y sumarlo a la caché del historial)
+    pipe = async_redis_client.pipeline(transaction=True)
+    await _publish(pipe, response.data[0])
+    await pipe.execute()
     
     return response.data[0]
 
-@router.get("/sessions/{session_id}/messages", response_model=List[Message])
-def get_message_history(session_id: UUID):
-    response = supabase.table("chat_messages").select("*").eq("session_id", str(session_id)).order("timestamp").execute()
-    return response.data
+async def _publish(pipe, message_row: dict):
+    session_id = message_row['session_id']
+    channel = f"{CHAT_CHANNEL_PREFIX}{session_id}"
+    payload = json.dumps({
+        "id": str(message_row["id"]),
+        "sender_id": str(message_row["sender_id"]),
+        "sender_type": message_row["sender_type"],
+        "content": message_row["content"],
+        "timestamp": message_row["timestamp"]
+    })
+    if settings.CHAT_TRANSPORT == "streams":
+        await append_and_publish(pipe, session_id, channel, payload)
+    else:
+        pipe.publish(channel, payload)
+    cache_message(pipe, message_row)
 
-@router.websocket("/ws/{session_id}")
-async def websocket_endpoint(websocket: WebSocket, session_id: UUID):
-    await manager.connect(websocket, session_id)
-    pubsub = redis_client.pubsub()
-    await pubsub.subscribe(f"chat_channel:{session_id}")
+@router.get("/sessions/{session_id}/messages", response_model=MessagePage)
+async def get_message_history(session_id: UUID,
+                        before: Optional[str] = None,
+                        after: Optional[str] = None,
+                        limit: int = Query(50, ge=1, le=200)):
+    if before and after:
+        raise HTTPException(status_code=400, detail="Use either 'before' or 'after', not both")
+    try:
+        before_key = decode_cursor(before) if before else None
+        after_key = decode_cursor(after) if after else None
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
+    if before_key is None and after_key is None:
+        # Abrir un chat: los últimos mensajes salen de Redis si la sesión está en caché
+        messages = await cached_latest(session_id, limit)
+        if messages is None:
+            messages = await query_page(session_id, max(limit, settings.CHAT_HISTORY_CACHE_SIZE))
+            messages = (await fill_cache(session_id, messages))[-limit:]
+    else:
+        messages = await query_page(session_id, limit, before=before_key, after=after_key)
+
+    return MessagePage(
+        messages=messages,
+        before=encode_cursor(messages[0]) if len(messages) == limit else None,
+        after=encode_cursor(messages[-1]) if messages else after,
+    )
+
+@router.websocket("/ws/{session_id}")
+async def websocket_endpoint(websocket: WebSocket, session_id: UUID, last_stream_id: Optional[str] = None):
+    connection = await manager.connect(websocket, session_id, last_stream_id)
     try:
+        # Los mensajes de Redis los entrega el listener compartido del manager;
+        # leer lo que manda el cliente es lo que nos avisa de la desconexión
         while True:
-            message = await pubsub.get_message(ignore_subscribe_messages=True)
-            if message:
-                await manager.send_personal_message(message['data'], session_id)
-            # Mantener la conexión viva y escuchar otros mensajes si es necesario
-            # Por ejemplo, si el cliente envía un mensaje directamente por WebSocket
-            # data = await websocket.receive_text()
-            # await manager.send_personal_message(f"Echo: {data}", session_id)
+            await websocket.receive_text()
     except WebSocketDisconnect:
-        manager.disconnect(session_id)
-        await pubsub.unsubscribe(f"chat_channel:{session_id}")
-        await pubsub.close()
\ No newline at end of file
+        pass
+    finally:
+        manager.disconnect(session_id, connection)
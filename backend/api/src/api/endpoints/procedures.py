@@ -2,38 +2,40 @@ from turtle import mode
 from fastapi import APIRouter, Depends, HTTPException, status
 from typing import List
 from uuid import UUID
-from db.supabase_client import supabase
+from core.availability import invalidate_procedure
+from db.mutations import update_or_404
+from db.supabase_client import async_supabase
 from schemas.procedure import Procedure, ProcedureCreate, ProcedureUpdate
 
 router = APIRouter(prefix="/procedures", tags=["Procedures"])
 
 @router.post("/", response_model=Procedure, status_code=status.HTTP_201_CREATED)
-def create_procedure(procedure: ProcedureCreate):
-    response = supabase.table("procedures").insert(procedure.model_dump(mode="json")).execute()
+async def create_procedure(procedure: ProcedureCreate):
+    response = await async_supabase.table("procedures").insert(procedure.model_dump(mode="json")).execute()
     if not response.data:
         raise HTTPException(status_code=400, detail="Error creating procedure")
     return response.data[0]
 
 @router.get("/", response_model=List[Procedure])
-def read_procedures(skip: int = 0, limit: int = 100):
-    response = supabase.table("procedures").select("*, departments(name)").range(skip, skip + limit - 1).execute()
+async def read_procedures(skip: int = 0, limit: int = 100):
+    response = await async_supabase.table("procedures").select("*, departments(name)").range(skip, skip + limit - 1).execute()
     return response.data
 
 @router.get("/{procedure_id}", response_model=Procedure)
-def read_procedure(procedure_id: UUID):
-    response = supabase.table("procedures").select("*, departments(name)").eq("id", procedure_id).execute()
+async def read_procedure(procedure_id: UUID):
+    response = await async_supabase.table("procedures").select("*, departments(name)").eq("id", procedure_id).execute()
     if not response.data:
         raise HTTPException(status_code=404, detail="Procedure not found")
     return response.data[0]
 
 @router.put("/{procedure_id}", response_model=Procedure)
-def update_procedure(procedure_id: UUID, procedure_update: ProcedureUpdate):
-    response = supabase.table("procedures").update(procedure_update.model_dump(exclude_unset=True)).eq("id", procedure_id).execute()
-    if not response.data:
-        raise HTTPException(status_code=404, detail="Procedure not found")
-    return response.data[0]
+async def update_procedure(procedure_id: UUID, procedure_update: ProcedureUpdate):
+    procedure = await update_or_404("procedures", "id", procedure_id, procedure_update.model_dump(exclude_unset=True), "Procedure not found")
+    invalidate_procedure(procedure_id)
+    return procedure
 
 @router.delete("/{procedure_id}")
-def delete_procedure(procedure_id: UUID):
-    supabase.table("procedures").delete().eq("id", procedure_id).execute()
+async def delete_procedure(procedure_id: UUID):
+    await async_supabase.table("procedures").delete().eq("id", procedure_id).execute()
+    invalidate_procedure(procedure_id)
     return {"message": "Procedure deleted successfully"}
\ No newline at end of file
@@ -1,87 +1,230 @@
-from datetime import date, timedelta
-from fastapi import APIRouter, HTTPException, status, Query
-from typing import List
+import json
+from datetime import date, timedelta, timezone
+from fastapi import APIRouter, HTTPException, status, Query, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from jose.exceptions import JWTError
+from typing import List, Optional, Tuple
 from uuid import UUID
 from datetime import datetime
-from db.supabase_client import supabase
-from schemas.turno import Turno, TurnoCreate
+from core.availability import (BOOKED_STATUSES, ProcedureSchedule, available_slots, mark_slot, next_openings,
+                               procedure_schedule, procedure_schedules, slot_bookings)
+from core.citizen_cache import resolve_citizen
+from core.config import settings
+from core.security import create_citizen_token, verify_citizen_token
+from core.slot_holds import acquire_hold, owns_hold, release_hold
+from core.turno_waitlist import (OFFERS_TOKEN_AUDIENCE, TURNO_CHANNEL_PREFIX, join_waitlist, leave_waitlist,
+                                 pending_offer, publish_release, waitlist_expiry)
+from db.supabase_client import async_supabase
+from schemas.turno import (SlotHold, SlotHoldCreate, SlotOpening, Turno, TurnoCreate, WaitlistEntry,
+                           WaitlistEntryCreate)
+from endpoints.chat import ConnectionManager
 from endpoints.tickets import get_citizen_by_dni
 
 router = APIRouter(prefix="/turnos", tags=["Turnos"])
 
+# Días por defecto y máximos de la búsqueda de próximos turnos libres
+DEFAULT_RANGE_DAYS = 30
+MAX_RANGE_DAYS = 90
+# Trámites por consulta del rango: cada uno puede armar un índice por día de la ventana
+MAX_RANGE_PROCEDURES = 20
+
+# Sockets de los ciudadanos en lista de espera, por citizen_id: reciben las ofertas de slots liberados.
+# Tiene su propia suscripción (turno_channel:*), aparte de la del chat
+offers_manager = ConnectionManager(channel_prefix=TURNO_CHANNEL_PREFIX)
+
+@router.post("/holds", response_model=SlotHold, status_code=status.HTTP_201_CREATED)
+async def hold_slot(hold: SlotHoldCreate):
+    """
+    Retiene una ventanilla del slot por TURNO_HOLD_TTL segundos mientras el
+    ciudadano confirma. Si todas están tomadas o retenidas, responde 409 sin tocar la base.
+    """
+    schedule, bookings = await _validate_slot(hold.procedure_id, hold.scheduled_at)
+    if bookings >= schedule.desks:
+        raise HTTPException(status_code=409, detail="Slot already booked")
+    hold_id = await acquire_hold(hold.procedure_id, hold.scheduled_at, schedule.desks - bookings)
+    if hold_id is None:
+        raise HTTPException(status_code=409, detail="Slot is on hold by other citizens")
+    return SlotHold(
+        procedure_id=hold.procedure_id,
+        scheduled_at=hold.scheduled_at,
+        hold_id=hold_id,
+        expires_at=datetime.now(timezone.utc) + timedelta(seconds=settings.TURNO_HOLD_TTL),
+    )
+
 @router.post("/", response_model=Turno, status_code=status.HTTP_201_CREATED)
-def create_turno(turno: TurnoCreate):
-    citizen = get_citizen_by_dni(turno.citizen_dni)
-    
-    # Verificar que el procedimiento existe
-    procedure = supabase.table("procedures").select("*").eq("id", turno.procedure_id).execute()
-    if not procedure.data:
+async def create_turno(turno: TurnoCreate):
+    citizen = await get_citizen_by_dni(turno.citizen_dni)
+    schedule, bookings = await _validate_slot(turno.procedure_id, turno.scheduled_at)
+
+    if turno.hold_id:
+        hold_id = turno.hold_id
+        # Un hold de una oferta de la lista de espera solo lo usa el ciudadano al que se le ofreció
+        if not await owns_hold(turno.procedure_id, turno.scheduled_at, hold_id, citizen["id"]):
+            raise HTTPException(status_code=409, detail="Hold expired or not found")
+    else:
+        # Sin hold previo, el slot se retiene mientras dura la creación
+        hold_id = await acquire_hold(turno.procedure_id, turno.scheduled_at, schedule.desks - bookings)
+        if hold_id is None:
+            raise HTTPException(status_code=409, detail="Slot is fully booked or on hold")
+
+    try:
+        if bookings >= schedule.desks:
+            raise HTTPException(status_code=409, detail="Slot already booked")
+
+        turno_data = turno.model_dump(mode="json", exclude={"citizen_dni", "hold_id"})
+        turno_data["citizen_id"] = str(citizen["id"])
+        
+        response = await async_supabase.table("turnos").insert(turno_data).execute()
+        if not response.data:
+            raise HTTPException(status_code=400, detail="Error creating turno")
+        created = response.data[0]
+
+        # Un hold vencido no protege el slot: si quedó con más turnos que ventanillas, este se deshace
+        if not await _within_capacity(created, schedule.desks):
+            await async_supabase.table("turnos").delete().eq("id", created["id"]).execute()
+            raise HTTPException(status_code=409, detail="Slot already booked")
+
+        await mark_slot(turno.procedure_id, turno.scheduled_at, booked=True)
+        return created
+    finally:
+        await release_hold(turno.procedure_id, turno.scheduled_at, hold_id)
+
+async def _validate_slot(procedure_id: UUID, scheduled_at: datetime) -> Tuple[ProcedureSchedule, int]:
+    """Verifica el trámite y que el horario sea un slot de su calendario; devuelve el calendario y los turnos del slot."""
+    schedule = await procedure_schedule(procedure_id)
+    if schedule is None:
         raise HTTPException(status_code=404, detail="Procedure not found")
+    bookings = await slot_bookings(procedure_id, schedule, scheduled_at)
+    if bookings is None:
+        raise HTTPException(status_code=400, detail="scheduled_at is not a valid slot for this procedure")
+    return schedule, bookings
 
-    turno_data = turno.model_dump(exclude={"citizen_dni"})
-    turno_data["citizen_id"] = citizen.id
-    
-    response = supabase.table("turnos").insert(turno_data).execute()
-    if not response.data:
-        raise HTTPException(status_code=400, detail="Error creating turno")
-    return response.data[0]
+async def _within_capacity(turno_row: dict, desks: int) -> bool:
+    """
+    Si el slot del turno recién guardado no tiene más turnos que ventanillas.
+    Si varios se guardan a la vez y cada uno ve a los otros, se deshacen
+    todos los que sobran o más: nunca queda el slot sobrevendido.
+    """
+    response = await async_supabase.table("turnos").select("id").eq("procedure_id", turno_row["procedure_id"]).eq("scheduled_at", turno_row["scheduled_at"]).in_("status", BOOKED_STATUSES).limit(desks + 1).execute()
+    return len(response.data) <= desks
 
 @router.get("/", response_model=List[Turno])
-def read_turnos(skip: int = 0, limit: int = 100):
-    response = supabase.table("turnos").select("*").range(skip, skip + limit - 1).execute()
+async def read_turnos(skip: int = 0, limit: int = 100):
+    response = await async_supabase.table("turnos").select("*").range(skip, skip + limit - 1).execute()
     return response.data
 
 @router.get("/available-slots", response_model=List[datetime])
-def get_available_slots(
+async def get_available_slots(
     procedure_id: UUID,
     target_date: date = Query(..., description="Fecha a consultar en formato YYYY-MM-DD")
 ):
     """
     Devuelve una lista de horas disponibles para un procedimiento en una fecha específica.
+    Sale del índice de disponibilidad en Redis; la base solo se consulta para armarlo.
     """
-    # 1. Obtener detalles del procedimiento (duración)
-    procedure_response = supabase.table("procedures").select("duration_minutes").eq("id", procedure_id).execute()
-    if not procedure_response.data:
+    slots = await available_slots(procedure_id, target_date)
+    if slots is None:
         raise HTTPException(status_code=404, detail="Procedure not found")
-    
-    duration = procedure_response.data[0]['duration_minutes']
-    
-    # 2. Definir horario laboral (ej: 9:00 a 17:00)
-    start_time = datetime.combine(target_date, datetime.min.time()).replace(hour=9)
-    end_time = datetime.combine(target_date, datetime.min.time()).replace(hour=17)
-    
-    # 3. Generar todos los posibles slots del día
-    possible_slots = []
-    current_time = start_time
-    while current_time + timedelta(minutes=duration) <= end_time:
-        possible_slots.append(current_time)
-        current_time += timedelta(minutes=duration)
-
-    # 4. Obtener los turnos ya ocupados para ese procedimiento y fecha
-    start_of_day = datetime.combine(target_date, datetime.min.time())
-    end_of_day = datetime.combine(target_date, datetime.max.time())
-    
-    booked_turnos_response = supabase.table("turnos").select("scheduled_at").eq("procedure_id", procedure_id).gte("scheduled_at", start_of_day.isoformat()).lte("scheduled_at", end_of_day.isoformat()).in_("status", ["programado", "completado"]).execute()
-    
-    booked_slots = {datetime.fromisoformat(t['scheduled_at'].replace('Z', '+00:00')) for t in booked_turnos_response.data}
-
-    # 5. Calcular slots disponibles
-    available_slots = [slot for slot in possible_slots if slot not in booked_slots]
-    
-    return available_slots
+    return slots
+
+@router.get("/available-slots/range", response_model=List[SlotOpening])
+async def get_available_slots_range(
+    procedure_id: List[UUID] = Query(..., max_length=MAX_RANGE_PROCEDURES,
+                                     description=f"Uno o más trámites, hasta {MAX_RANGE_PROCEDURES} (repetir el parámetro)"),
+    start_date: Optional[date] = Query(None, description="Primer día, YYYY-MM-DD (por defecto, hoy)"),
+    end_date: Optional[date] = Query(None, description=f"Último día, inclusive (por defecto, {DEFAULT_RANGE_DAYS} días)"),
+    limit: int = Query(10, ge=1, le=200),
+    stream: bool = Query(False, description="Devolver los horarios a medida que se encuentran, como NDJSON")
+):
+    """
+    Devuelve los próximos `limit` horarios libres de uno o más trámites dentro
+    de una ventana de días, en orden. Reemplaza consultar día por día.
+    """
+    now = datetime.now(timezone.utc).replace(tzinfo=None)
+    start_date = start_date or now.date()
+    end_date = end_date or start_date + timedelta(days=DEFAULT_RANGE_DAYS - 1)
+    if end_date < start_date:
+        raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+    if (end_date - start_date).days >= MAX_RANGE_DAYS:
+        raise HTTPException(status_code=400, detail=f"Date range cannot exceed {MAX_RANGE_DAYS} days")
+
+    schedules = await procedure_schedules(procedure_id)
+    if len(schedules) < len({str(procedure) for procedure in procedure_id}):
+        raise HTTPException(status_code=404, detail="Procedure not found")
+
+    openings = next_openings(schedules, start_date, end_date, limit, after=now)
+    if stream:
+        async def lines():
+            async for procedure, slot in openings:
+                yield json.dumps({"procedure_id": procedure, "scheduled_at": slot.isoformat()}) + "\n"
+        return StreamingResponse(lines(), media_type="application/x-ndjson")
+    return [SlotOpening(procedure_id=procedure, scheduled_at=slot) async for procedure, slot in openings]
 
 @router.get("/{turno_id}", response_model=Turno)
-def read_turno(turno_id: UUID):
-    response = supabase.table("turnos").select("*").eq("id", turno_id).execute()
+async def read_turno(turno_id: UUID):
+    response = await async_supabase.table("turnos").select("*").eq("id", turno_id).execute()
     if not response.data:
         raise HTTPException(status_code=404, detail="Turno not found")
     return response.data[0]
 
 @router.put("/{turno_id}/cancelar", response_model=Turno)
-def cancel_turno(turno_id: UUID):
-    db_turno = supabase.table("turnos").select("*").eq("id", turno_id).execute()
-    if not db_turno.data:
-        raise HTTPException(status_code=404, detail="Turno not found")
-    
-    response = supabase.table("turnos").update({"status": "cancelado"}).eq("id", turno_id).execute()
-    return response.data[0]
\ No newline at end of file
+async def cancel_turno(turno_id: UUID):
+    # Solo se cancela un turno programado: si dos pedidos llegan juntos, el
+    # segundo no encuentra la fila y el slot se libera una sola vez
+    response = await async_supabase.table("turnos").update({"status": "cancelado"}) \
+        .eq("id", turno_id).eq("status", "programado").execute()
+    if not response.data:
+        await read_turno(turno_id)
+        raise HTTPException(status_code=409, detail="Turno is not scheduled")
+    turno = response.data[0]
+    await mark_slot(turno["procedure_id"], turno["scheduled_at"], booked=False)
+    await publish_release(turno["procedure_id"], turno["scheduled_at"])
+    return turno
+
+@router.post("/waitlist", response_model=WaitlistEntry, status_code=status.HTTP_201_CREATED)
+async def join_turno_waitlist(entry: WaitlistEntryCreate):
+    """
+    Anota al ciudadano en la lista de espera del trámite para ese día. Cuando se
+    cancela un turno de ese día, el primero de la lista recibe la oferta por
+    /turnos/ws/{citizen_dni}?token=..., con el token que se devuelve acá, y el
+    slot queda retenido a su nombre.
+    """
+    citizen = await get_citizen_by_dni(entry.citizen_dni)
+    if await procedure_schedule(entry.procedure_id) is None:
+        raise HTTPException(status_code=404, detail="Procedure not found")
+    position = await join_waitlist(entry.procedure_id, entry.date, citizen["id"])
+    token = create_citizen_token(citizen["id"], OFFERS_TOKEN_AUDIENCE, waitlist_expiry(entry.date))
+    return WaitlistEntry(procedure_id=entry.procedure_id, date=entry.date, citizen_id=citizen["id"],
+                         position=position, token=token)
+
+@router.delete("/waitlist/{procedure_id}/{target_date}")
+async def leave_turno_waitlist(procedure_id: UUID, target_date: date, citizen_dni: str):
+    citizen = await get_citizen_by_dni(citizen_dni)
+    if not await leave_waitlist(procedure_id, target_date, citizen["id"]):
+        raise HTTPException(status_code=404, detail="Waitlist entry not found")
+    return {"message": "Left waitlist successfully"}
+
+@router.websocket("/ws/{citizen_dni}")
+async def waitlist_websocket(websocket: WebSocket, citizen_dni: str, token: str = ""):
+    # Las ofertas traen el hold: solo las recibe quien tiene el token de POST /turnos/waitlist
+    citizen = await resolve_citizen(citizen_dni)
+    try:
+        authorized = citizen is not None and verify_citizen_token(token, OFFERS_TOKEN_AUDIENCE) == str(citizen["id"])
+    except JWTError:
+        authorized = False
+    if not authorized:
+        await websocket.close(code=1008)
+        return
+    citizen_id = UUID(str(citizen["id"]))
+    connection = await offers_manager.connect(websocket, citizen_id)
+    # La oferta que llegó mientras el ciudadano no estaba conectado
+    offer = await pending_offer(citizen_id)
+    if offer is not None:
+        offers_manager.broadcast(offer, citizen_id)
+    try:
+        while True:
+            await websocket.receive_text()
+    except WebSocketDisconnect:
+        pass
+    finally:
+        offers_manager.disconnect(citizen_id, connection)
\ No newline at end of file
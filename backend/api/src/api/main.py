@@ -1,11 +1,38 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from v1.api import api_router
 from core.config import settings
+from core.chat_persistence import ChatMessageFlusher
+from core.turno_waitlist import SlotReleaseWorker
+from db.supabase_client import close_async_supabase
+from endpoints.chat import manager
+from endpoints.turnos import offers_manager
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    flusher = None
+    if settings.CHAT_WRITE_BEHIND:
+        flusher = ChatMessageFlusher()
+        flusher.start()
+    release_worker = None
+    if settings.TURNO_WAITLIST_WORKER:
+        release_worker = SlotReleaseWorker()
+        await release_worker.start()
+    yield
+    # Los listeners de pub/sub arrancan con el primer WebSocket de cada manager
+    await manager.stop_listener()
+    await offers_manager.stop_listener()
+    if release_worker is not None:
+        await release_worker.stop()
+    if flusher is not None:
+        flusher.stop()
+    await close_async_supabase()
 
 app = FastAPI(
     title="API de Gestión Gubernamental",
     description="API para la gestión de tickets, turnos y chat del Gobierno de Argentina.",
     version="1.0.0",
+    lifespan=lifespan,
 )
 
 app.include_router(api_router)
@@ -1,6 +1,7 @@
 from fastapi import APIRouter, HTTPException
 from typing import List, Optional, Dict, Any
 import uuid
+from core.text_normalizer import fold_accents, normalize, normalize_query
 
 router = APIRouter(
     prefix="/chatbot",
@@ -56,6 +57,14 @@ tramites_db = [
     }
 ]
 
+# Términos normalizados de cada trámite, calculados una sola vez al importar el módulo
+tramites_terms = [
+    set(normalize(tramite["nombre"] + " " + tramite["descripcion"])) for tramite in tramites_db
+]
+tramites_folded = [
+    fold_accents(tramite["nombre"] + " " + tramite["descripcion"]) for tramite in tramites_db
+]
+
 informacion_util_db = [
     {
         "categoria": "emergencia",
@@ -90,21 +99,25 @@ informacion_util_db = [
 @router.get("/tramites/", response_model=List[Dict])
 async def buscar_tramites(palabra_clave: Optional[str] = None, categoria: Optional[str] = None):
     """
-    Buscar trámites por palabra clave o categoría
+    Buscar trámites por palabra clave o categoría.
+    La palabra clave se normaliza (tildes, stopwords, plurales): "licencias" o
+    "tramite" encuentran "Licencia" y "trámite". También se aceptan fragmentos.
     """
     resultados = tramites_db
     
     if palabra_clave:
+        terminos = set(normalize_query(palabra_clave))
+        fragmento = fold_accents(palabra_clave.strip())
         resultados = [
-            tramite for tramite in resultados 
-            if palabra_clave.lower() in tramite["nombre"].lower() 
-            or palabra_clave.lower() in tramite["descripcion"].lower()
+            tramite for tramite, terms, folded in zip(tramites_db, tramites_terms, tramites_folded)
+            if (terminos and terminos <= terms) or fragmento in folded
         ]
     
     if categoria:
+        categoria = fold_accents(categoria)
         resultados = [
             tramite for tramite in resultados 
-            if tramite["categoria"].lower() == categoria.lower()
+            if fold_accents(tramite["categoria"]) == categoria
         ]
     
     return resultados
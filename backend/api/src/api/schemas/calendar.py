@@ -0,0 +1,61 @@
+from pydantic import BaseModel, Field, field_validator, model_validator
+from typing import Dict, List, Optional
+from uuid import UUID
+from datetime import date, datetime, time
+
+class OpeningInterval(BaseModel):
+    start: time
+    end: time
+
+    @model_validator(mode="after")
+    def check_order(self):
+        if self.end <= self.start:
+            raise ValueError("end must be after start")
+        return self
+
+class OfficeCalendarBase(BaseModel):
+    # Día de la semana (0 = lunes ... 6 = domingo) -> franjas de atención; los días que no están, cerrado
+    opening_hours: Dict[int, List[OpeningInterval]]
+    # Ventanillas que atienden en paralelo: turnos por slot
+    desks: int = Field(1, ge=1, le=255)
+    holidays: List[date] = []
+
+    @field_validator("opening_hours")
+    @classmethod
+    def check_weekdays(cls, opening_hours):
+        if any(weekday not in range(7) for weekday in opening_hours):
+            raise ValueError("weekdays must be between 0 (Monday) and 6 (Sunday)")
+        return opening_hours
+
+class OfficeCalendarCreate(OfficeCalendarBase):
+    # Uno de los dos: el calendario de un trámite pisa al de su departamento
+    department_id: Optional[UUID] = None
+    procedure_id: Optional[UUID] = None
+
+    @model_validator(mode="after")
+    def check_scope(self):
+        if (self.department_id is None) == (self.procedure_id is None):
+            raise ValueError("set exactly one of department_id or procedure_id")
+        return self
+
+class OfficeCalendarUpdate(BaseModel):
+    opening_hours: Optional[Dict[int, List[OpeningInterval]]] = None
+    desks: Optional[int] = Field(None, ge=1, le=255)
+    holidays: Optional[List[date]] = None
+
+    @field_validator("opening_hours", "desks", "holidays")
+    @classmethod
+    def check_not_null(cls, value):
+        # Se pueden omitir, pero en la tabla son NOT NULL
+        if value is None:
+            raise ValueError("must not be null")
+        return value
+
+class OfficeCalendar(OfficeCalendarBase):
+    id: UUID
+    department_id: Optional[UUID] = None
+    procedure_id: Optional[UUID] = None
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
@@ -1,6 +1,7 @@
 from pydantic import BaseModel
 from uuid import UUID
 from datetime import datetime
+from typing import List, Optional
 
 class MessageBase(BaseModel):
     content: str
@@ -18,4 +19,11 @@ class Message(MessageBase):
     timestamp: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class MessagePage(BaseModel):
+    messages: List[Message]
+    # Cursor para pedir los mensajes anteriores (None si no hay más)
+    before: Optional[str] = None
+    # Cursor del último mensaje de la página, para pedir los posteriores
+    after: Optional[str] = None
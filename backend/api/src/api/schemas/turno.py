@@ -1,13 +1,13 @@
 from pydantic import BaseModel
 from uuid import UUID
-from datetime import datetime
+from datetime import date, datetime
+from typing import Optional
 from enum import Enum
 
 class TurnoStatus(str, Enum):
-    abierto = "abierto"
-    en_progreso = "en_progreso"
-    resuelto = "resuelto"
-    cerrado = "cerrado"
+    programado = "programado"
+    completado = "completado"
+    cancelado = "cancelado"
 
 class TurnoBase(BaseModel):
     procedure_id: UUID
@@ -15,6 +15,8 @@ class TurnoBase(BaseModel):
 
 class TurnoCreate(TurnoBase):
     citizen_dni: str
+    # Hold devuelto por POST /turnos/holds; sin él, el slot se retiene solo durante la creación
+    hold_id: Optional[str] = None
 
 class Turno(TurnoBase):
     id: UUID
@@ -23,4 +25,29 @@ class Turno(TurnoBase):
     created_at: datetime
 
     class Config:
-        from_attributes = True
\ No newline at end of file
+        from_attributes = True
+
+class SlotOpening(BaseModel):
+    procedure_id: UUID
+    scheduled_at: datetime
+
+class SlotHoldCreate(TurnoBase):
+    pass
+
+class SlotHold(TurnoBase):
+    hold_id: str
+    expires_at: datetime
+
+class WaitlistEntryCreate(BaseModel):
+    procedure_id: UUID
+    date: date
+    citizen_dni: str
+
+class WaitlistEntry(BaseModel):
+    procedure_id: UUID
+    date: date
+    citizen_id: UUID
+    # 1 = el próximo al que se le ofrece un slot que se libere
+    position: int
+    # Para escuchar las ofertas en /turnos/ws/{citizen_dni}?token=...; vence con la lista
+    token: str
@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from endpoints import citizens, officials, tickets, turnos, chat, departments, procedures
+from endpoints import citizens, officials, tickets, turnos, chat, departments, procedures, calendars
 api_router = APIRouter(prefix="/api/v1")
 
 api_router.include_router(citizens.router)
@@ -8,4 +8,5 @@ api_router.include_router(officials.router)
 api_router.include_router(tickets.router)
 api_router.include_router(turnos.router)
 api_router.include_router(procedures.router)
+api_router.include_router(calendars.router)
 api_router.include_router(chat.router)
\ No newline at end of file
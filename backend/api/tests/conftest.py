@@ -1,9 +1,39 @@
 # tests/conftest.py
+import json
+import os
+import sys
+import uuid
+from datetime import datetime, timezone
+from urllib.parse import parse_qsl
+
 import pytest
+
+# La app se importa como en producción, desde src/api (`from core.config import settings`)
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "src", "api"))
+# Settings exige estas variables; los tests nunca se conectan a estos servicios
+_DUMMY_KEY = "eyJhbGciOiJIUzI1NiJ9.eyJyb2xlIjoiYW5vbiJ9.test"
+for _name, _value in {
+    "SUPABASE_URL": "http://supabase.test",
+    "SUPABASE_KEY": _DUMMY_KEY,
+    "SUPABASE_SERVICE_ROLE_KEY": _DUMMY_KEY,
+    "REDIS_URL": "redis://redis.test:6379/0",
+    "SECRET_KEY": "test-secret",
+}.items():
+    os.environ.setdefault(_name, _value)
+
+import httpx
 from fastapi.testclient import TestClient
 from unittest.mock import MagicMock, patch
-from app.main import app
-from app.core.config import settings
+from redis.commands.core import AsyncScript
+from main import app
+from core.config import settings
+
+# Módulos que guardan su propia referencia al cliente de Redis
+ASYNC_REDIS_MODULES = [
+    "core.redis", "core.availability", "core.slot_holds", "core.turno_waitlist", "core.citizen_cache",
+    "core.chat_history", "core.chat_stream", "endpoints.chat",
+]
+SYNC_REDIS_MODULES = ["core.redis", "core.chat_persistence"]
 
 @pytest.fixture(scope="module")
 def client():
@@ -13,6 +43,146 @@ def client():
     with TestClient(app) as c:
         yield c
 
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """
+    Reemplaza los clientes de Redis (asíncrono y sincrónico) por uno en memoria
+    con soporte de Lua, y vuelve a registrar los scripts de cada módulo en él.
+    Devuelve el cliente asíncrono; el sincrónico queda en `fake_redis.sync`.
+    Necesita `fakeredis[lua]` instalado.
+    """
+    fakeredis = pytest.importorskip("fakeredis")
+    pytest.importorskip("lupa")
+    server = fakeredis.FakeServer()
+    async_client = fakeredis.FakeAsyncRedis(server=server, decode_responses=True)
+    sync_client = fakeredis.FakeRedis(server=server, decode_responses=True)
+    for module_name in ASYNC_REDIS_MODULES:
+        module = sys.modules.get(module_name) or __import__(module_name, fromlist=["_"])
+        monkeypatch.setattr(module, "async_redis_client", async_client, raising=False)
+        for name, value in list(vars(module).items()):
+            if isinstance(value, AsyncScript):
+                monkeypatch.setattr(module, name, async_client.register_script(value.script))
+    for module_name in SYNC_REDIS_MODULES:
+        module = __import__(module_name, fromlist=["_"])
+        monkeypatch.setattr(module, "redis_client", sync_client, raising=False)
+    # Las cachés en memoria no deben pasar de un test a otro
+    from core import availability, citizen_cache
+    availability._schedules.clear()
+    citizen_cache._local_cache.clear()
+    async_client.sync = sync_client
+    return async_client
+
+class FakePostgrest:
+    """
+    Tablas en memoria detrás del transporte HTTP del cliente asíncrono de
+    Supabase: entiende los filtros, el orden, los inserts, updates y deletes que usa la API.
+    `calls` registra (método, tabla) de cada request.
+    """
+
+    def __init__(self, max_rows: int = 1000):
+        self.tables: dict = {}
+        self.calls: list = []
+        # Como db-max-rows de PostgREST: ninguna respuesta trae más filas
+        self.max_rows = max_rows
+
+    def rows(self, table: str) -> list:
+        return self.tables.setdefault(table, [])
+
+    def handle(self, request: httpx.Request) -> httpx.Response:
+        table = request.url.path.rsplit("/", 1)[-1]
+        self.calls.append((request.method, table))
+        params = parse_qsl(request.url.query.decode())
+        rows = self.rows(table)
+        if request.method == "POST":
+            body = json.loads(request.content)
+            created = []
+            for row in body if isinstance(body, list) else [body]:
+                row = {"id": str(uuid.uuid4()), **row}
+                if table == "chat_messages":
+                    row.setdefault("timestamp", datetime.now(timezone.utc).isoformat())
+                if table == "turnos":
+                    # Los defaults de la tabla, y timestamptz devuelve el horario en UTC
+                    row.setdefault("status", "programado")
+                    row.setdefault("created_at", datetime.now(timezone.utc).isoformat())
+                    row["scheduled_at"] = _as_utc(row["scheduled_at"])
+                rows.append(row)
+                created.append(row)
+            return httpx.Response(201, json=created)
+
+        matched = [row for row in rows if all(_matches(row, key, value) for key, value in params
+                                                if key not in ("select", "limit", "offset", "order", "columns"))]
+        if request.method == "PATCH":
+            for row in matched:
+                row.update(json.loads(request.content))
+            return httpx.Response(200, json=matched)
+        if request.method == "DELETE":
+            for row in matched:
+                rows.remove(row)
+            return httpx.Response(200, json=matched)
+        query = dict(params)
+        for order in reversed(query.get("order", "").split(",") if query.get("order") else []):
+            column, _, direction = order.partition(".")
+            matched.sort(key=lambda row: row.get(column), reverse=direction.startswith("desc"))
+        offset = int(query.get("offset", 0))
+        limit = min(int(query.get("limit", self.max_rows)), self.max_rows)
+        return httpx.Response(200, json=matched[offset:offset + limit])
+
+def _as_utc(value: str) -> str:
+    parsed = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.astimezone(timezone.utc).isoformat()
+
+def _matches(row: dict, column: str, condition: str) -> bool:
+    if column == "or":
+        # or=(a.in.(1,2),b.in.(3)): alcanza con los filtros `in` que usa la API
+        clauses = condition[1:-1].replace("),", ")\n").split("\n")
+        return any(_matches(row, *clause.split(".", 1)) for clause in clauses)
+    operator, _, value = condition.partition(".")
+    cell = row.get(column)
+    if operator == "eq":
+        return str(cell) == value.strip('"')
+    if operator == "in":
+        return str(cell) in [item.strip('"') for item in value.strip("()").split(",")]
+    if column == "scheduled_at" and cell is not None:
+        cell, value = datetime.fromisoformat(_as_utc(cell)), datetime.fromisoformat(_as_utc(value))
+    if operator == "gt":
+        return cell is not None and cell > value
+    if operator == "gte":
+        return cell is not None and cell >= value
+    if operator == "lte":
+        return cell is not None and cell <= value
+    raise AssertionError(f"Filtro no soportado por FakePostgrest: {column}={condition}")
+
+@pytest.fixture
+def fake_supabase(monkeypatch):
+    """Conecta el cliente asíncrono de Supabase a un `FakePostgrest` en memoria."""
+    import db.supabase_client as supabase_client
+    fake = FakePostgrest()
+    monkeypatch.setattr(supabase_client.http_client, "_transport", httpx.MockTransport(fake.handle))
+    return fake
+
+@pytest.fixture
+def procedure_id(fake_supabase):
+    """Un trámite de 30 minutos sin calendario propio: lunes a viernes de 9 a 17, con una ventanilla."""
+    procedure_id = str(uuid.uuid4())
+    fake_supabase.rows("procedures").append({"id": procedure_id, "duration_minutes": 30, "department_id": None})
+    return procedure_id
+
+@pytest.fixture
+def add_citizen(fake_supabase):
+    """Agrega un ciudadano con ese DNI y devuelve su id."""
+    def add(dni: str) -> str:
+        citizen_id = str(uuid.uuid4())
+        fake_supabase.rows("citizens").append({"id": citizen_id, "dni": dni, "first_name": "Ana", "last_name": "Gómez"})
+        return citizen_id
+    return add
+
+@pytest.fixture
+def citizen_dni(add_citizen):
+    add_citizen("30111222")
+    return "30111222"
+
 @pytest.fixture
 def mock_supabase_client():
     """
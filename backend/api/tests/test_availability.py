@@ -0,0 +1,121 @@
+import asyncio
+from datetime import date, datetime
+from uuid import uuid4
+
+import httpx
+
+from core import availability
+from core.availability import available_slots, availability_key, mark_slot, procedure_schedule
+from core.config import settings
+
+# Un lunes: con el calendario por defecto, slots de 30 minutos de 9 a 17
+MONDAY = date(2030, 3, 4)
+
+
+def _book(fake_supabase, procedure_id, hour, minute=0, status="programado"):
+    fake_supabase.rows("turnos").append({
+        "id": str(uuid4()), "procedure_id": procedure_id, "citizen_id": str(uuid4()),
+        "scheduled_at": f"{MONDAY.isoformat()}T{hour:02d}:{minute:02d}:00+00:00", "status": status,
+    })
+
+
+def _slot_of(turno):
+    return datetime.fromisoformat(turno["scheduled_at"]).replace(tzinfo=None)
+
+
+def test_build_reads_every_page_of_turnos(fake_redis, fake_supabase, procedure_id, monkeypatch):
+    # PostgREST corta cada respuesta en db-max-rows sin avisar
+    fake_supabase.max_rows = 2
+    monkeypatch.setattr(settings, "AVAILABILITY_PAGE_SIZE", 2)
+    for hour in range(9, 14):
+        _book(fake_supabase, procedure_id, hour)
+    _book(fake_supabase, procedure_id, 14, status="cancelado")
+
+    slots = asyncio.run(available_slots(procedure_id, MONDAY))
+    booked = {datetime(2030, 3, 4, hour) for hour in range(9, 14)}
+    assert booked.isdisjoint(slots)
+    assert datetime(2030, 3, 4, 14) in slots
+    assert len(slots) == 16 - len(booked)
+    assert fake_supabase.calls.count(("GET", "turnos")) == 3
+
+
+def test_build_pages_do_not_skip_turnos_when_one_is_cancelled(fake_redis, fake_supabase, procedure_id,
+                                                              monkeypatch):
+    import db.supabase_client as supabase_client
+    fake_supabase.max_rows = 2
+    monkeypatch.setattr(settings, "AVAILABILITY_PAGE_SIZE", 2)
+    for hour in range(9, 14):
+        _book(fake_supabase, procedure_id, hour)
+    first_page = sorted(fake_supabase.rows("turnos"), key=lambda turno: turno["id"])[:2]
+
+    def cancel_after_first_page(request):
+        response = fake_supabase.handle(request)
+        if fake_supabase.calls.count(("GET", "turnos")) == 1:
+            # Un turno de la primera página se cancela mientras se pide la segunda
+            first_page[0]["status"] = "cancelado"
+        return response
+
+    monkeypatch.setattr(supabase_client.http_client, "_transport", httpx.MockTransport(cancel_after_first_page))
+    slots = asyncio.run(available_slots(procedure_id, MONDAY))
+    still_booked = {_slot_of(turno) for turno in fake_supabase.rows("turnos") if turno["status"] == "programado"}
+    assert len(still_booked) == 4
+    assert still_booked.isdisjoint(slots)
+
+
+def test_booking_during_the_build_is_not_lost(fake_redis, fake_supabase, procedure_id, monkeypatch):
+    booked_turnos = availability._booked_turnos
+
+    async def booking_after_the_read(*args):
+        turnos = await booked_turnos(*args)
+        # create_turno termina después de que el armado leyó la base
+        _book(fake_supabase, procedure_id, 11)
+        await mark_slot(procedure_id, datetime(2030, 3, 4, 11), booked=True)
+        return turnos
+
+    monkeypatch.setattr(availability, "_booked_turnos", booking_after_the_read)
+    slots = asyncio.run(available_slots(procedure_id, MONDAY))
+    assert datetime(2030, 3, 4, 11) not in slots
+    assert fake_redis.sync.keys("availability:*") == [
+        availability_key(procedure_id, asyncio.run(procedure_schedule(procedure_id)), MONDAY)
+    ]
+
+
+def test_build_keeps_an_index_stored_meanwhile(fake_redis, fake_supabase, procedure_id, monkeypatch):
+    booked_turnos = availability._booked_turnos
+
+    async def other_build_stores_first(*args):
+        turnos = await booked_turnos(*args)
+        # Otro proceso guarda el índice, con un turno que esta lectura no vio
+        key = availability_key(procedure_id, await procedure_schedule(procedure_id), MONDAY)
+        await fake_redis.bitfield(key).set("u8", "#4", 1).execute()
+        return turnos
+
+    monkeypatch.setattr(availability, "_booked_turnos", other_build_stores_first)
+    slots = asyncio.run(available_slots(procedure_id, MONDAY))
+    assert datetime(2030, 3, 4, 11) not in slots
+    assert len(slots) == 15
+
+
+def test_cancellation_during_the_build_never_frees_a_booked_slot(fake_redis, fake_supabase, procedure_id,
+                                                                 monkeypatch):
+    fake_supabase.rows("office_calendars").append({
+        "id": str(uuid4()), "procedure_id": procedure_id, "department_id": None, "desks": 2, "holidays": [],
+        "opening_hours": {"0": [{"start": "09:00", "end": "17:00"}]},
+    })
+    _book(fake_supabase, procedure_id, 10)
+    _book(fake_supabase, procedure_id, 10)
+    booked_turnos = availability._booked_turnos
+
+    async def cancellation_before_the_read(*args):
+        # cancel_turno termina después de que empezó el armado y antes de que lea la base
+        fake_supabase.rows("turnos")[0]["status"] = "cancelado"
+        await mark_slot(procedure_id, datetime(2030, 3, 4, 10), booked=False)
+        return await booked_turnos(*args)
+
+    monkeypatch.setattr(availability, "_booked_turnos", cancellation_before_the_read)
+
+    async def bookings():
+        schedule = await procedure_schedule(procedure_id)
+        return await availability.slot_bookings(procedure_id, schedule, datetime(2030, 3, 4, 10))
+
+    assert asyncio.run(bookings()) == 1
@@ -0,0 +1,31 @@
+from uuid import uuid4
+
+import pytest
+from fastapi.testclient import TestClient
+
+from main import app
+
+
+@pytest.fixture
+def calendar_id(fake_supabase):
+    calendar_id = str(uuid4())
+    fake_supabase.rows("office_calendars").append({
+        "id": calendar_id, "procedure_id": str(uuid4()), "department_id": None, "desks": 2, "holidays": [],
+        "opening_hours": {"0": [{"start": "09:00", "end": "17:00"}]}, "created_at": "2030-03-01T09:00:00+00:00",
+    })
+    return calendar_id
+
+
+@pytest.mark.parametrize("field", ["opening_hours", "desks", "holidays"])
+def test_update_calendar_rejects_null(fake_supabase, calendar_id, field):
+    response = TestClient(app).put(f"/api/v1/calendars/{calendar_id}", json={field: None})
+    assert response.status_code == 422
+    assert ("PATCH", "office_calendars") not in fake_supabase.calls
+    assert fake_supabase.rows("office_calendars")[0]["desks"] == 2
+
+
+def test_update_calendar_changes_only_the_fields_sent(fake_supabase, calendar_id):
+    response = TestClient(app).put(f"/api/v1/calendars/{calendar_id}", json={"desks": 3})
+    assert response.status_code == 200
+    assert response.json()["desks"] == 3
+    assert response.json()["opening_hours"] == {"0": [{"start": "09:00:00", "end": "17:00:00"}]}
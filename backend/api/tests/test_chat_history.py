@@ -0,0 +1,57 @@
+import asyncio
+from uuid import uuid4
+
+import pytest
+from fastapi.testclient import TestClient
+
+from core.chat_history import cached_latest, fill_cache, query_page
+from core.config import settings
+from endpoints.chat import send_message
+from main import app
+from schemas.chat import MessageCreate
+
+
+@pytest.fixture
+def session_id(fake_supabase):
+    session_id = str(uuid4())
+    fake_supabase.rows("chat_messages").append({
+        "id": str(uuid4()), "session_id": session_id, "sender_id": str(uuid4()),
+        "sender_type": "official", "content": "Hola, ¿en qué te ayudo?",
+        "timestamp": "2026-01-05T12:00:00+00:00",
+    })
+    return session_id
+
+
+def _message(session_id, content):
+    return MessageCreate(session_id=session_id, sender_id=uuid4(), sender_type="citizen", content=content)
+
+
+def test_history_includes_messages_not_yet_flushed(fake_redis, fake_supabase, session_id, monkeypatch):
+    monkeypatch.setattr(settings, "CHAT_WRITE_BEHIND", True)
+    client = TestClient(app)
+    sent = client.post(f"/api/v1/chat/sessions/{session_id}/messages",
+                       json=_message(session_id, "Quiero un turno").model_dump(mode="json"))
+    assert sent.status_code == 200
+    # El flusher todavía no lo guardó en Supabase
+    assert len(fake_supabase.rows("chat_messages")) == 1
+
+    for _ in range(2):
+        # La primera lectura llena la caché desde Supabase; la segunda sale de Redis
+        history = client.get(f"/api/v1/chat/sessions/{session_id}/messages")
+        assert history.status_code == 200
+        contents = [message["content"] for message in history.json()["messages"]]
+        assert contents == ["Hola, ¿en qué te ayudo?", "Quiero un turno"]
+
+
+def test_fill_keeps_messages_sent_during_the_query(fake_redis, fake_supabase, session_id):
+    async def scenario():
+        snapshot = await query_page(session_id, settings.CHAT_HISTORY_CACHE_SIZE)
+        # Un mensaje que llega entre la consulta y el llenado de la caché
+        await send_message(session_id, _message(session_id, "¿Sigue ahí?"))
+        assert await cached_latest(session_id, 10) is None
+        filled = await fill_cache(session_id, snapshot)
+        return filled, await cached_latest(session_id, 10)
+
+    filled, cached = asyncio.run(scenario())
+    assert [message["content"] for message in filled] == ["Hola, ¿en qué te ayudo?", "¿Sigue ahí?"]
+    assert cached == filled
@@ -0,0 +1,62 @@
+from unittest.mock import MagicMock
+
+import pytest
+
+from core import chat_persistence
+from core.chat_persistence import PENDING_KEY, PROCESSING_KEY, ChatMessageFlusher, enqueue_message
+
+
+def _message(number):
+    return {"id": f"message-{number}", "session_id": "session", "content": f"hola {number}"}
+
+
+def _enqueue(redis, messages):
+    pipe = redis.pipeline()
+    for message in messages:
+        enqueue_message(pipe, message)
+    pipe.execute()
+
+
+@pytest.fixture
+def supabase(monkeypatch):
+    client = MagicMock()
+    monkeypatch.setattr(chat_persistence, "supabase", client)
+    return client
+
+
+def test_recover_moves_processing_back_to_pending_in_order(fake_redis, supabase):
+    redis = fake_redis.sync
+    _enqueue(redis, [_message(number) for number in range(3)])
+    flusher = ChatMessageFlusher(batch_size=10, interval=0.01)
+    # Un proceso que se cayó después de tomar el lote y antes de insertarlo
+    supabase.table.return_value.upsert.return_value.execute.side_effect = RuntimeError("caído")
+    with pytest.raises(RuntimeError):
+        flusher.flush_once(wait=False)
+    assert redis.llen(PENDING_KEY) == 0
+    assert redis.llen(PROCESSING_KEY) == 3
+
+    assert flusher.recover() == 3
+    assert redis.llen(PROCESSING_KEY) == 0
+    assert redis.llen(PENDING_KEY) == 3
+
+    # Al reintentar se insertan todos, en el orden en que se enviaron
+    supabase.table.return_value.upsert.return_value.execute.side_effect = None
+    assert flusher.flush_once(wait=False) == 3
+    rows = supabase.table.return_value.upsert.call_args.args[0]
+    assert [row["id"] for row in rows] == ["message-0", "message-1", "message-2"]
+    assert supabase.table.return_value.upsert.call_args.kwargs == {"on_conflict": "id"}
+
+
+def test_flush_once_clears_processing_after_insert(fake_redis, supabase):
+    redis = fake_redis.sync
+    _enqueue(redis, [_message(number) for number in range(5)])
+    flusher = ChatMessageFlusher(batch_size=2, interval=0.01)
+
+    assert flusher.flush_once(wait=False) == 2
+    assert redis.llen(PROCESSING_KEY) == 0
+    assert redis.llen(PENDING_KEY) == 3
+    assert flusher.recover() == 0
+
+
+def test_recover_with_nothing_pending(fake_redis, supabase):
+    assert ChatMessageFlusher().recover() == 0
@@ -0,0 +1,68 @@
+"""
+`core/text_normalizer.py` es una copia del normalizador del bot
+(rasa-chat `actions/text_normalizer.py`): la API busca trámites con los mismos
+términos que el bot indexa. Estos tests fallan si las dos copias divergen.
+"""
+import importlib.util
+import os
+
+import pytest
+
+from core import text_normalizer as api_normalizer
+
+BOT_ACTIONS_DIR = os.path.join(os.path.dirname(__file__), "..", "..", "rasa-chat", "src", "rasa-chat", "actions")
+
+
+def _load_bot_module(name):
+    spec = importlib.util.spec_from_file_location(f"bot_{name}", os.path.join(BOT_ACTIONS_DIR, f"{name}.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+bot_normalizer = _load_bot_module("text_normalizer")
+
+QUERIES = [
+    "¿Cómo saco turno para renovar la licencia de conducir?",
+    "Necesito el DNI por primera vez para mi hijo",
+    "PASAPORTES urgentes!!! ¿dónde los tramito?",
+    "quiero pagar las infracciones y multas de tránsito",
+    "inscripciones escolares, vacantes y becas",
+    "habilitación comercial de un local gastronómico",
+    "árboles caídos, baches y luminarias rotas en la vereda",
+    "cómo me registro en Mi BA con clave ciudad",
+    "ñandú pingüino acción informática",
+    "",
+]
+
+
+def _corpus():
+    faqs = _load_bot_module("gcba_faqs_db").faqs_database
+    texts = list(QUERIES)
+    for faq in faqs:
+        texts.append(faq["pregunta"])
+        texts.append(faq["respuesta"])
+        texts.extend(faq.get("keywords", []))
+    return texts
+
+
+def test_constants_match_bot():
+    assert api_normalizer.TOKEN_PATTERN.pattern == bot_normalizer.TOKEN_PATTERN.pattern
+    assert api_normalizer.STOPWORDS == bot_normalizer.STOPWORDS
+    assert api_normalizer.DERIVATIONAL_SUFFIXES == bot_normalizer.DERIVATIONAL_SUFFIXES
+    assert api_normalizer.PLURAL_ES_CONSONANTS == bot_normalizer.PLURAL_ES_CONSONANTS
+    assert api_normalizer.MIN_STEM_LENGTH == bot_normalizer.MIN_STEM_LENGTH
+
+
+@pytest.mark.parametrize("function", ["fold_accents", "clean_text", "normalize", "normalize_query"])
+def test_same_output_as_bot(function):
+    api_function = getattr(api_normalizer, function)
+    bot_function = getattr(bot_normalizer, function)
+    for text in _corpus():
+        assert api_function(text) == bot_function(text), text
+
+
+def test_same_stems_as_bot():
+    words = {word for text in _corpus() for word in api_normalizer.fold_accents(text.lower()).split()}
+    for word in sorted(words):
+        assert api_normalizer.stem(word) == bot_normalizer.stem(word), word
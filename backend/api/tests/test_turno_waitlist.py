@@ -0,0 +1,118 @@
+import asyncio
+import json
+from datetime import date, datetime
+from unittest.mock import AsyncMock
+from uuid import uuid4
+
+import pytest
+from fastapi.testclient import TestClient
+from starlette.websockets import WebSocketDisconnect
+
+from core.slot_holds import acquire_hold, hold_key, owns_hold
+from core.turno_waitlist import (PENDING_KEY, TURNO_CHANNEL_PREFIX, SlotReleaseWorker, join_waitlist, offer_key,
+                                 pending_offer, waitlist_key)
+from endpoints import turnos
+from endpoints.chat import ConnectionManager
+from main import app
+
+MONDAY = date(2030, 3, 4)
+SLOT = datetime(2030, 3, 4, 10)
+
+
+def test_offer_hold_survives_a_shorter_hold(fake_redis):
+    procedure_id = uuid4()
+
+    async def scenario():
+        offer = await acquire_hold(procedure_id, SLOT, free_desks=2, ttl_seconds=300)
+        assert await acquire_hold(procedure_id, SLOT, free_desks=2, ttl_seconds=120) is not None
+        ttl = await fake_redis.pttl(hold_key(procedure_id, SLOT))
+        return offer, ttl, await owns_hold(procedure_id, SLOT, offer, uuid4())
+
+    offer, ttl, owned = asyncio.run(scenario())
+    assert ttl > 120 * 1000
+    assert owned
+
+
+def test_waitlist_keeps_join_order(fake_redis):
+    # Se anotan uno tras otro, muchos en el mismo milisegundo: el orden no puede depender del reloj
+    procedure_id = uuid4()
+    citizens = [str(uuid4()) for _ in range(50)]
+
+    async def scenario():
+        positions = [await join_waitlist(procedure_id, MONDAY, citizen) for citizen in citizens]
+        # Anotarse de nuevo no cambia el lugar
+        assert await join_waitlist(procedure_id, MONDAY, citizens[0]) == 1
+        return positions, [citizen for citizen, _ in await fake_redis.zpopmin(waitlist_key(procedure_id, MONDAY), 50)]
+
+    positions, popped = asyncio.run(scenario())
+    assert positions == list(range(1, 51))
+    assert popped == citizens
+
+
+def test_cancelled_slot_is_offered_to_the_first_in_line(fake_redis, fake_supabase, procedure_id):
+    turno_id = str(uuid4())
+    fake_supabase.rows("turnos").append({
+        "id": turno_id, "procedure_id": procedure_id, "citizen_id": str(uuid4()),
+        "scheduled_at": f"{SLOT.isoformat()}+00:00", "status": "programado",
+        "created_at": "2030-03-01T09:00:00+00:00",
+    })
+    first, second = uuid4(), uuid4()
+    asyncio.run(join_waitlist(procedure_id, MONDAY, first))
+    asyncio.run(join_waitlist(procedure_id, MONDAY, second))
+
+    api = TestClient(app)
+    assert api.put(f"/api/v1/turnos/{turno_id}/cancelar").status_code == 200
+    # Cancelar de nuevo no libera el slot otra vez
+    assert api.put(f"/api/v1/turnos/{turno_id}/cancelar").status_code == 409
+    assert fake_redis.sync.llen(PENDING_KEY) == 1
+
+    async def process():
+        processed = await SlotReleaseWorker(offer_ttl=300).process_once(timeout=0.1)
+        return processed, await pending_offer(first), await pending_offer(second)
+
+    processed, offer, other = asyncio.run(process())
+    assert processed
+    assert other is None
+    offer = json.loads(offer)
+    assert offer["type"] == "slot_offer"
+    assert asyncio.run(owns_hold(procedure_id, SLOT, offer["hold_id"], first))
+    assert not asyncio.run(owns_hold(procedure_id, SLOT, offer["hold_id"], second))
+    assert fake_redis.sync.zrange(waitlist_key(procedure_id, MONDAY), 0, -1) == [str(second)]
+
+
+def test_offer_hold_is_only_for_the_citizen_it_was_offered_to(fake_redis, fake_supabase, procedure_id, add_citizen):
+    offered = add_citizen("30111222")
+    add_citizen("30999888")
+    hold_id = asyncio.run(acquire_hold(procedure_id, SLOT, free_desks=1, ttl_seconds=300, citizen_id=offered))
+    api = TestClient(app)
+    body = {"procedure_id": procedure_id, "scheduled_at": f"{SLOT.isoformat()}+00:00", "hold_id": hold_id}
+
+    # Quien escuchó la oferta de otro no puede usar su hold
+    assert api.post("/api/v1/turnos/", json={**body, "citizen_dni": "30999888"}).status_code == 409
+    created = api.post("/api/v1/turnos/", json={**body, "citizen_dni": "30111222"})
+    assert created.status_code == 201
+    assert created.json()["citizen_id"] == offered
+
+
+def test_offers_socket_needs_the_citizens_token(fake_redis, fake_supabase, procedure_id, add_citizen, monkeypatch):
+    citizen_id = add_citizen("30111222")
+    add_citizen("30999888")
+    manager = ConnectionManager(channel_prefix=TURNO_CHANNEL_PREFIX)
+    # Sin pub/sub: alcanza con la oferta pendiente que se envía al conectarse
+    monkeypatch.setattr(manager, "start_listener", AsyncMock())
+    monkeypatch.setattr(turnos, "offers_manager", manager)
+    api = TestClient(app)
+    tokens = {}
+    for dni in ("30111222", "30999888"):
+        joined = api.post("/api/v1/turnos/waitlist", json={"procedure_id": procedure_id, "date": MONDAY.isoformat(),
+                                                           "citizen_dni": dni})
+        assert joined.status_code == 201
+        tokens[dni] = joined.json()["token"]
+    fake_redis.sync.set(offer_key(citizen_id), json.dumps({"type": "slot_offer", "hold_id": "secreto"}))
+
+    for query in ("", f"?token={tokens['30999888']}", "?token=invalido"):
+        with pytest.raises(WebSocketDisconnect):
+            with api.websocket_connect(f"/api/v1/turnos/ws/30111222{query}") as websocket:
+                websocket.receive_text()
+    with api.websocket_connect(f"/api/v1/turnos/ws/30111222?token={tokens['30111222']}") as websocket:
+        assert json.loads(websocket.receive_text())["hold_id"] == "secreto"
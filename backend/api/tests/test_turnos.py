@@ -0,0 +1,77 @@
+from unittest.mock import AsyncMock
+from uuid import uuid4
+
+import pytest
+from fastapi.testclient import TestClient
+
+from endpoints import turnos
+from main import app
+
+
+# Un lunes a las 10: con el calendario por defecto, un slot de una sola ventanilla
+SLOT = "2030-03-04T10:00:00+00:00"
+
+
+@pytest.fixture
+def api():
+    return TestClient(app)
+
+
+def test_second_hold_on_a_full_slot_conflicts(fake_redis, fake_supabase, procedure_id, citizen_dni, api):
+    slot = {"procedure_id": procedure_id, "scheduled_at": SLOT}
+    first = api.post("/api/v1/turnos/holds", json=slot)
+    assert first.status_code == 201
+    second = api.post("/api/v1/turnos/holds", json=slot)
+    assert second.status_code == 409
+    assert second.json()["detail"] == "Slot is on hold by other citizens"
+    # Sin hold, tampoco se puede crear el turno mientras el primero confirma
+    assert api.post("/api/v1/turnos/", json={**slot, "citizen_dni": citizen_dni}).status_code == 409
+    assert ("POST", "turnos") not in fake_supabase.calls
+
+
+def test_create_turno_rolls_back_when_the_slot_is_over_capacity(fake_redis, fake_supabase, procedure_id,
+                                                                citizen_dni, api):
+    # El índice del día se arma con el slot libre...
+    assert api.get("/api/v1/turnos/available-slots",
+                   params={"procedure_id": procedure_id, "target_date": "2030-03-04"}).status_code == 200
+    # ...y otro turno entra en la base sin pasar por el índice (por ejemplo, con un hold vencido)
+    fake_supabase.rows("turnos").append({
+        "id": str(uuid4()), "procedure_id": procedure_id, "citizen_id": str(uuid4()),
+        "scheduled_at": SLOT, "status": "programado", "created_at": "2030-03-01T09:00:00+00:00",
+    })
+
+    response = api.post("/api/v1/turnos/", json={"procedure_id": procedure_id, "scheduled_at": SLOT,
+                                                 "citizen_dni": citizen_dni})
+    assert response.status_code == 409
+    assert len(fake_supabase.rows("turnos")) == 1
+    assert ("DELETE", "turnos") in fake_supabase.calls
+    # El hold de la creación se libera: el slot no queda retenido
+    assert not fake_redis.sync.keys("turno_hold:*")
+
+
+def test_cancel_turno_releases_the_slot_once(fake_redis, fake_supabase, api, monkeypatch):
+    mark_slot = AsyncMock()
+    monkeypatch.setattr(turnos, "mark_slot", mark_slot)
+    turno_id = str(uuid4())
+    fake_supabase.rows("turnos").append({
+        "id": turno_id, "procedure_id": str(uuid4()), "citizen_id": str(uuid4()),
+        "scheduled_at": "2030-03-04T10:00:00+00:00", "status": "programado",
+        "created_at": "2030-03-01T09:00:00+00:00",
+    })
+
+    first = api.put(f"/api/v1/turnos/{turno_id}/cancelar")
+    assert first.status_code == 200
+    assert first.json()["status"] == "cancelado"
+    # Un segundo pedido (o uno concurrente) no vuelve a liberar el slot
+    second = api.put(f"/api/v1/turnos/{turno_id}/cancelar")
+    assert second.status_code == 409
+    assert mark_slot.await_count == 1
+
+    assert api.put(f"/api/v1/turnos/{uuid4()}/cancelar").status_code == 404
+
+
+def test_available_slots_range_caps_the_procedures(fake_redis, fake_supabase, api):
+    too_many = [str(uuid4()) for _ in range(turnos.MAX_RANGE_PROCEDURES + 1)]
+    response = api.get("/api/v1/turnos/available-slots/range", params={"procedure_id": too_many})
+    assert response.status_code == 422
+    assert not fake_supabase.calls
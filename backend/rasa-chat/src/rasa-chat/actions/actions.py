@@ -69,19 +69,80 @@ from rasa_sdk import Action, Tracker, FormValidationAction
 from rasa_sdk.executor import CollectingDispatcher
 from rasa_sdk.events import SlotSet, FollowupAction, AllSlotsReset, ConversationPaused
 from typing import Text, List, Any, Dict
-from .gcba_faqs_db import faqs_database # Python ve el archivo y la lista
+from .faq_index import FAQIndex, category_key, confident_matches
+from .answer_cache import AnswerCache, CachedAnswer
+from .faq_artifact import DEFAULT_SOURCE_PATH, load_or_compile, resolve_path
+from .faq_reloader import FAQIndexHolder
+from . import metrics
+import importlib
+import os
+import sys
 import random
-import re
 import json
 
-faqs_database = []
+# Modo de búsqueda: "bm25" (índice invertido) o "tfidf" (n-gramas de caracteres)
+FAQ_MATCHER = os.getenv("FAQ_MATCHER", "bm25").lower()
+# Índice compilado con `python -m actions.faq_artifact`; si existe se mapea en
+# memoria, y se recompila si gcba_faqs_db.py cambió. Relativo a la carpeta del bot
+FAQ_INDEX_PATH = resolve_path(os.getenv("FAQ_INDEX_PATH", "faqs_index.bin"))
+FAQ_SOURCE_PATH = DEFAULT_SOURCE_PATH
+# Segundos entre chequeos de cambios en los archivos de FAQs (0 desactiva la vigilancia)
+FAQ_RELOAD_INTERVAL = float(os.getenv("FAQ_RELOAD_INTERVAL", "5"))
+# Si se define, cualquier mensaje publicado en FAQ_RELOAD_CHANNEL dispara una recarga
+FAQ_RELOAD_REDIS_URL = os.getenv("FAQ_RELOAD_REDIS_URL")
+FAQ_RELOAD_CHANNEL = os.getenv("FAQ_RELOAD_CHANNEL", "faq_reload")
+# Caché de respuestas: cantidad máxima de consultas y segundos de vigencia
+FAQ_CACHE_SIZE = int(os.getenv("FAQ_CACHE_SIZE", "2048"))
+FAQ_CACHE_TTL = float(os.getenv("FAQ_CACHE_TTL", "600"))
+
+
+def load_faq_index():
+    """Construye el índice de FAQs; se llama al iniciar y en cada recarga en caliente."""
+    if FAQ_MATCHER != "tfidf" and os.path.exists(FAQ_INDEX_PATH):
+        try:
+            index = load_or_compile(FAQ_INDEX_PATH, _load_faqs_database)
+        except OSError as e:
+            # Sin permiso para recompilar el artefacto: se arma el índice en memoria
+            print(f"ADVERTENCIA: No se pudo recompilar {FAQ_INDEX_PATH}: {e}")
+        else:
+            print(f"DEBUG: Índice compilado de FAQs mapeado desde {FAQ_INDEX_PATH}. Total: {len(index)}")
+            return index
+
+    faqs_database = _load_faqs_database()
+    if FAQ_MATCHER == "tfidf":
+        from .faq_vectorizer import CharNGramMatcher
+        return CharNGramMatcher(faqs_database)
+    return FAQIndex(faqs_database)
+
+
+def _load_faqs_database():
+    faqs_database = []
+    try:
+        module_name = f"{__package__}.gcba_faqs_db"
+        if module_name in sys.modules:
+            # En una recarga volvemos a ejecutar el módulo para leer la versión nueva
+            faqs_module = importlib.reload(sys.modules[module_name])
+        else:
+            faqs_module = importlib.import_module(module_name)
+        faqs_database = faqs_module.faqs_database
+        print(f"DEBUG: FAQs cargadas exitosamente. Total: {len(faqs_database)}")
+    except ImportError:
+        print("ADVERTENCIA CRÍTICA: No se pudo importar el módulo gcba_faqs_db. Busque el archivo en la carpeta de actions.")
+    return faqs_database
+
+
+faq_index_holder = FAQIndexHolder(load_faq_index)
+if FAQ_RELOAD_INTERVAL > 0:
+    faq_index_holder.watch_files([FAQ_INDEX_PATH, FAQ_SOURCE_PATH], FAQ_RELOAD_INTERVAL)
+if FAQ_RELOAD_REDIS_URL:
+    faq_index_holder.listen_redis(FAQ_RELOAD_REDIS_URL, FAQ_RELOAD_CHANNEL)
+
+faq_answer_cache = AnswerCache(FAQ_CACHE_SIZE, FAQ_CACHE_TTL)
+# Las respuestas cacheadas dejan de valer en cuanto cambia el corpus
+faq_index_holder.add_listener(lambda _index: faq_answer_cache.clear())
 
-try:
-    from .gcba_faqs_db import faqs_database as loaded_faqs
-    faqs_database = loaded_faqs
-    print(f"DEBUG: FAQs cargadas exitosamente. Total: {len(faqs_database)}")
-except ImportError:
-    print("ADVERTENCIA CRÍTICA: No se pudo importar el módulo gcba_faqs_db. Busque el archivo en la carpeta de actions.")
+# Cantidad de FAQs a devolver: la respuesta y hasta dos sugerencias
+FAQ_TOP_K = 3
 
 
 class ActionSubmitAppointmentForm(Action):
@@ -185,52 +246,56 @@ class ActionSearchFAQ(Action):
             tracker: Tracker,
             domain: Dict[Text, Any]) -> List[Dict[Text, Any]]:
 
-        user_text = tracker.latest_message['text'].lower()
+        user_text = tracker.latest_message['text']
+        # Tomamos una sola referencia: una recarga en curso no afecta esta búsqueda
+        faq_index, generation = faq_index_holder.snapshot()
         
         categoria_filtrada = tracker.get_slot('process_category') 
 
-        best_match = None
-        max_score = 0
-        
- 
-        if categoria_filtrada:
-            search_pool = [
-                faq for faq in faqs_database 
-                if faq.get('categoria', '').lower() == categoria_filtrada.lower()
-            ]
-            print(f"DEBUG: Buscando en categoría filtrada: {categoria_filtrada}. Pool size: {len(search_pool)}")
-        else:
-            search_pool = faqs_database
-            print(f"DEBUG: Buscando en TODAS las FAQs. Pool size: {len(search_pool)}")
-
-        user_words = set(re.findall(r'\b\w{3,}\b', user_text))
-
-        for faq in search_pool:
-            
-            faq_terms = " ".join(faq.get('keywords', [])).lower() + " " + faq.get('pregunta', '').lower()
-            
-            score = 0
-            for word in user_words:
-                if word in faq_terms:
-                    score += 1
-
-            if score > max_score:
-                max_score = score
-                best_match = faq
-
-        if best_match and max_score >= 2:
-            
-            respuesta_final = (
-                f"**{best_match['pregunta']}**\n\n"
-                f"{best_match['respuesta']} "
-                f"\n\n👉 Más información aquí: {best_match['url_referencia']}."
-            )
-            dispatcher.utter_message(text=respuesta_final)
-            
+        # La generación va en la clave: si una recarga limpia la caché mientras
+        # buscamos, lo que guardemos con el índice viejo nunca se vuelve a leer
+        cache_key = (
+            generation,
+            faq_index.query_key(user_text),
+            category_key(categoria_filtrada) if categoria_filtrada else "",
+        )
+        cached = faq_answer_cache.get(cache_key)
+        if cached is None:
+            cached = self._build_answer(faq_index, user_text, categoria_filtrada)
+            if faq_index_holder.generation == generation:
+                faq_answer_cache.put(cache_key, cached)
+
+        if cached.text:
+            dispatcher.utter_message(text=cached.text)
         else:
             dispatcher.utter_message(response="utter_faq_not_found")
         return [SlotSet("process_category", None)]
 
+    @staticmethod
+    def _build_answer(faq_index, user_text: Text, categoria_filtrada: Text) -> CachedAnswer:
+        """Busca la FAQ y arma el texto de respuesta, con sugerencias si las hay."""
+        metrics.emit("faq.pool_size", faq_index.pool_size(categoria_filtrada),
+                     categoria=categoria_filtrada or "todas")
+
+        matches = confident_matches(faq_index, user_text, categoria_filtrada, k=FAQ_TOP_K)
+        if not matches:
+            return CachedAnswer(None, None)
+
+        best_match = matches[0].faq
+        metrics.emit("faq.match_confidence", matches[0].confidence, faq_id=best_match['id'])
+
+        respuesta_final = (
+            f"**{best_match['pregunta']}**\n\n"
+            f"{best_match['respuesta']} "
+            f"\n\n👉 Más información aquí: {best_match['url_referencia']}."
+        )
+        alternativas = matches[1:]
+        if alternativas:
+            respuesta_final += "\n\n¿Quisiste decir...?\n" + "\n".join(
+                f"- {match.faq['pregunta']}" for match in alternativas
+            )
+        return CachedAnswer(respuesta_final, best_match['id'])
+
 class ValidateAppointmentForm(FormValidationAction):
     def name(self) -> Text:
         return "validate_appointment_form"
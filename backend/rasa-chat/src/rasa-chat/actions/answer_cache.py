@@ -0,0 +1,74 @@
+"""
+Caché LRU con vencimiento (TTL) para las respuestas de ActionSearchFAQ.
+El tráfico de WhatsApp es muy repetitivo ("cómo saco el dni", "turno
+licencia"), así que se guarda la respuesta ya formateada por consulta
+normalizada y categoría: un acierto evita tanto el ranking como el armado
+del texto. Se vacía cada vez que se recarga el corpus de FAQs.
+"""
+
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, NamedTuple, Optional, Text
+
+from . import metrics
+
+
+class CachedAnswer(NamedTuple):
+    """Respuesta cacheada; `text` es None cuando no se encontró ninguna FAQ."""
+    text: Optional[Text]
+    faq_id: Optional[int]
+
+
+class AnswerCache:
+    """LRU acotado a `max_size` entradas; cada entrada vence a los `ttl_seconds`."""
+
+    def __init__(self, max_size: int = 2048, ttl_seconds: float = 600.0):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.hits = 0
+        self.misses = 0
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        # El hilo de recarga del índice vacía la caché mientras las acciones la usan
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Optional[CachedAnswer]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                hit = True
+            else:
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                hit = False
+        metrics.emit("faq.cache_hit" if hit else "faq.cache_miss", 1)
+        return entry[1] if hit else None
+
+    def put(self, key: Hashable, answer: CachedAnswer) -> None:
+        if self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl_seconds, answer)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> Dict[Text, Any]:
+        total = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / total) if total else 0.0,
+        }
@@ -0,0 +1,293 @@
+"""
+Artefacto binario compilado de la base de FAQs.
+El paso de build compila el corpus, el vocabulario y los posteos BM25 de
+`FAQIndex` en un único archivo con tabla de offsets. El servidor de acciones
+lo abre con mmap: los workers comparten las mismas páginas del sistema
+operativo, el arranque no construye ningún índice y cada respuesta se
+decodifica solo cuando se devuelve.
+
+El archivo es una secuencia de bloques con el mismo formato: primero el
+índice global (que guarda las FAQs) y después una partición por categoría,
+cuyos posteos apuntan a las FAQs del bloque global.
+
+El header guarda además un hash de `gcba_faqs_db.py`: si el archivo de FAQs
+cambió desde que se compiló el artefacto, `load_or_compile` lo vuelve a
+compilar en vez de servir las FAQs viejas.
+
+Uso (desde la carpeta del bot):
+    python -m actions.faq_artifact faqs_index.bin
+"""
+
+import argparse
+import hashlib
+import json
+import mmap
+import os
+import struct
+from bisect import bisect_left
+from typing import Any, Callable, Dict, Iterable, List, Optional, Sequence, Text, Tuple
+
+from .faq_index import FAQIndex
+from .spelling import SpellingCorrector
+
+MAGIC = b"GCBAFAQ\x00"
+# Incrementar si cambia el formato o la tokenización usada al compilar
+FORMAT_VERSION = 4
+# Rutas por defecto, relativas a este módulo y no al directorio de trabajo
+BOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_INDEX_PATH = os.path.join(BOT_DIR, 'faqs_index.bin')
+DEFAULT_SOURCE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'gcba_faqs_db.py')
+
+# Secciones de cada bloque, en orden; el header guarda dónde empieza y termina cada una
+SECTIONS = (
+    'doc_offsets',        # u64[n_docs + 1] -> doc_blob (solo bloque global)
+    'doc_blob',           # FAQs en JSON utf-8, una detrás de otra (solo bloque global)
+    'doc_ids',            # u32[n_docs] -> id en el bloque global (solo particiones)
+    'length_norms',       # f64[n_docs]
+    'category_blob',      # JSON: lista de categorías normalizadas (solo bloque global)
+    'partition_offsets',  # u64[n_categorías] -> inicio del bloque de cada partición
+    'term_offsets',       # u32[n_terms + 1] -> term_blob
+    'term_blob',          # términos utf-8 ordenados por bytes
+    'term_idf',           # f64[n_terms]
+    'posting_offsets',    # u32[n_terms + 1] -> posting_docs / posting_freqs
+    'posting_docs',       # u32[n_postings]
+    'posting_freqs',      # f32[n_postings]
+)
+
+# Header: magic, versión, sha256 del archivo de FAQs (solo bloque global),
+# cantidades, parámetros BM25 y (inicio, fin) de cada sección, relativos al
+# inicio del bloque
+HEADER = struct.Struct('<8sI32sIIddd' + 'QQ' * len(SECTIONS))
+
+
+def resolve_path(path: Text) -> Text:
+    """Las rutas relativas se toman desde la carpeta del bot, no desde el directorio de trabajo."""
+    return path if os.path.isabs(path) else os.path.join(BOT_DIR, path)
+
+
+def source_digest(path: Text = DEFAULT_SOURCE_PATH) -> bytes:
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).digest()
+
+
+def _pack_array(fmt: Text, values: Iterable[Any]) -> bytes:
+    values = list(values)
+    return struct.pack(f'<{len(values)}{fmt}', *values)
+
+
+def _serialize_block(index: FAQIndex,
+                     doc_ids: Sequence[int] = (),
+                     categories: Sequence[Text] = (),
+                     partition_offsets: Sequence[int] = (),
+                     digest: bytes = b"") -> bytes:
+    sections: Dict[Text, bytes] = {name: b"" for name in SECTIONS}
+
+    if not doc_ids:
+        docs = [json.dumps(faq, ensure_ascii=False).encode('utf-8') for faq in index.faqs]
+        doc_offsets = [0]
+        for doc in docs:
+            doc_offsets.append(doc_offsets[-1] + len(doc))
+        sections['doc_offsets'] = _pack_array('Q', doc_offsets)
+        sections['doc_blob'] = b"".join(docs)
+    else:
+        sections['doc_ids'] = _pack_array('I', doc_ids)
+
+    sections['length_norms'] = _pack_array('d', index.length_norms)
+    if categories:
+        sections['category_blob'] = json.dumps(list(categories), ensure_ascii=False).encode('utf-8')
+        sections['partition_offsets'] = _pack_array('Q', partition_offsets)
+
+    terms = sorted(index.postings, key=lambda term: term.encode('utf-8'))
+    encoded_terms = [term.encode('utf-8') for term in terms]
+    term_offsets = [0]
+    posting_offsets = [0]
+    posting_docs: List[int] = []
+    posting_freqs: List[float] = []
+    for term, encoded in zip(terms, encoded_terms):
+        term_offsets.append(term_offsets[-1] + len(encoded))
+        for doc_id, freq in index.postings[term]:
+            posting_docs.append(doc_id)
+            posting_freqs.append(freq)
+        posting_offsets.append(len(posting_docs))
+    sections['term_offsets'] = _pack_array('I', term_offsets)
+    sections['term_blob'] = b"".join(encoded_terms)
+    sections['term_idf'] = _pack_array('d', (index.idf[term] for term in terms))
+    sections['posting_offsets'] = _pack_array('I', posting_offsets)
+    sections['posting_docs'] = _pack_array('I', posting_docs)
+    sections['posting_freqs'] = _pack_array('f', posting_freqs)
+
+    offsets = []
+    body = bytearray()
+    for name in SECTIONS:
+        # Alineamos cada sección a 8 bytes para leerla directo con memoryview.cast
+        body += b"\0" * (-(HEADER.size + len(body)) % 8)
+        offsets.append(HEADER.size + len(body))
+        body += sections[name]
+        offsets.append(HEADER.size + len(body))
+    body += b"\0" * (-(HEADER.size + len(body)) % 8)
+
+    header = HEADER.pack(MAGIC, FORMAT_VERSION, digest, len(index), len(terms),
+                         index.k1, index.b, index.default_idf, *offsets)
+    return header + bytes(body)
+
+
+def compile_faqs(faqs: Iterable[Dict[Text, Any]], path: Text, digest: bytes = b"") -> int:
+    """
+    Compila las FAQs en `path` y devuelve la cantidad de bytes escritos.
+    `digest` es el hash del archivo del que salieron (ver `source_digest`).
+    """
+    index = FAQIndex(faqs)
+    categories = list(index.partitions)
+
+    partition_blocks = [
+        _serialize_block(index.partitions[key], doc_ids=index.partition_doc_ids[key])
+        for key in categories
+    ]
+    # El tamaño del bloque global no depende del valor de los offsets (u64 fijos)
+    global_size = len(_serialize_block(index, categories=categories,
+                                       partition_offsets=[0] * len(categories), digest=digest))
+    partition_offsets = []
+    position = global_size
+    for block in partition_blocks:
+        partition_offsets.append(position)
+        position += len(block)
+    global_block = _serialize_block(index, categories=categories,
+                                    partition_offsets=partition_offsets, digest=digest)
+
+    # Escribimos a un temporal y renombramos: los workers que ya mapearon el
+    # archivo anterior siguen leyendo su versión sin ver uno a medio escribir.
+    # El temporal es por proceso: varios workers pueden recompilar a la vez
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(global_block)
+        for block in partition_blocks:
+            f.write(block)
+    os.replace(tmp_path, path)
+    return position
+
+
+class CompiledFAQIndex(FAQIndex):
+    """FAQIndex de solo lectura sobre un artefacto compilado y mapeado en memoria."""
+
+    def __init__(self, path: Text):
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self.path = path
+        self._parent: Optional[CompiledFAQIndex] = None
+        section = self._load_block(0)
+
+        self._doc_offsets = section['doc_offsets'].cast('Q')
+        self._doc_blob = section['doc_blob']
+        categories = json.loads(bytes(section['category_blob']))
+        partition_offsets = section['partition_offsets'].cast('Q')
+        self.partitions = {
+            key: self._load_partition(offset) for key, offset in zip(categories, partition_offsets)
+        }
+
+    def _load_partition(self, offset: int) -> 'CompiledFAQIndex':
+        partition = CompiledFAQIndex.__new__(CompiledFAQIndex)
+        partition._mmap = self._mmap
+        partition.path = self.path
+        partition._parent = self
+        partition.partitions = {}
+        section = partition._load_block(offset)
+        partition._doc_ids = section['doc_ids'].cast('I')
+        return partition
+
+    def _load_block(self, start: int) -> Dict[Text, memoryview]:
+        buffer = memoryview(self._mmap)
+        magic, version, digest, n_docs, n_terms, self.k1, self.b, self.default_idf, *offsets = \
+            HEADER.unpack_from(buffer, start)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f"{self.path} no es un índice de FAQs compatible (versión {version})")
+        self.source_digest = digest
+
+        section = {
+            name: buffer[start + offsets[2 * i]:start + offsets[2 * i + 1]]
+            for i, name in enumerate(SECTIONS)
+        }
+        self._n_terms = n_terms
+        self.length_norms = section['length_norms'].cast('d')
+        self._term_offsets = section['term_offsets'].cast('I')
+        self._term_blob = section['term_blob']
+        self._term_idf = section['term_idf'].cast('d')
+        self._posting_offsets = section['posting_offsets'].cast('I')
+        self._posting_docs = section['posting_docs'].cast('I')
+        self._posting_freqs = section['posting_freqs'].cast('f')
+        return section
+
+    def _term_at(self, position: int) -> bytes:
+        return bytes(self._term_blob[self._term_offsets[position]:self._term_offsets[position + 1]])
+
+    def _find_term(self, term: Text) -> int:
+        """Búsqueda binaria del término en el vocabulario ordenado; -1 si no está."""
+        target = term.encode('utf-8')
+        position = bisect_left(range(self._n_terms), target, key=self._term_at)
+        if position < self._n_terms and self._term_at(position) == target:
+            return position
+        return -1
+
+    def _lookup(self, term: Text) -> Optional[Tuple[float, Iterable[Tuple[int, float]]]]:
+        position = self._find_term(term)
+        if position < 0:
+            return None
+        start = self._posting_offsets[position]
+        end = self._posting_offsets[position + 1]
+        return self._term_idf[position], zip(self._posting_docs[start:end],
+                                             self._posting_freqs[start:end])
+
+    @property
+    def corrector(self) -> SpellingCorrector:
+        if self._parent is not None:
+            return self._parent.corrector
+        return super().corrector
+
+    def _vocabulary(self) -> Iterable[Tuple[Text, int]]:
+        # Solo se recorre si hace falta corregir un término (ver FAQIndex.corrector)
+        offsets = self._posting_offsets
+        for position in range(self._n_terms):
+            yield self._term_at(position).decode('utf-8'), offsets[position + 1] - offsets[position]
+
+    def _document(self, doc_id: int) -> Dict[Text, Any]:
+        if self._parent is not None:
+            return self._parent._document(self._doc_ids[doc_id])
+        start = self._doc_offsets[doc_id]
+        end = self._doc_offsets[doc_id + 1]
+        return json.loads(bytes(self._doc_blob[start:end]))
+
+
+def load_or_compile(path: Text, faqs_loader: Callable[[], List[Dict[Text, Any]]],
+                    source_path: Text = DEFAULT_SOURCE_PATH) -> CompiledFAQIndex:
+    """
+    Mapea el artefacto de `path` si se compiló desde la versión actual de
+    `source_path`; si no existe, es de otro formato o las FAQs cambiaron, lo
+    recompila antes con `faqs_loader()`.
+    """
+    digest = source_digest(source_path)
+    if os.path.exists(path):
+        try:
+            index = CompiledFAQIndex(path)
+            if index.source_digest == digest:
+                return index
+        except ValueError:
+            pass
+    faqs = faqs_loader()
+    compile_faqs(faqs, path, digest)
+    print(f"DEBUG: Índice de FAQs recompilado en {path}: {len(faqs)} FAQs")
+    return CompiledFAQIndex(path)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Compila la base de FAQs en un índice binario.")
+    parser.add_argument('output', nargs='?', default='faqs_index.bin',
+                        help="Ruta del archivo a generar, relativa a la carpeta del bot (por defecto: faqs_index.bin)")
+    args = parser.parse_args()
+
+    from .gcba_faqs_db import faqs_database
+    output = resolve_path(args.output)
+    size = compile_faqs(faqs_database, output, source_digest())
+    print(f"Índice compilado en {output}: {len(faqs_database)} FAQs, {size} bytes")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,220 @@
+"""
+Índice invertido para la búsqueda de FAQs del GCBA.
+Se construye una sola vez al iniciar el servidor de acciones a partir de
+`gcba_faqs_db.faqs_database`, de modo que cada consulta solo recorre las
+listas de posteo de sus propios términos y no el catálogo completo.
+
+Los textos pasan por `text_normalizer` (tildes, stopwords y stemming) tanto
+al indexar como al consultar. El ranking usa BM25 sobre los campos `pregunta`, `keywords`, `tags` y
+`respuesta`, cada uno con su peso. Las longitudes de documento y la tabla
+de IDF se precalculan al construir el índice. Los términos de la consulta
+que no están en el vocabulario se corrigen con `spelling.SpellingCorrector`
+antes de puntuar ("licensia" -> "licencia").
+
+Además del índice global se arma una partición por categoría, con sus
+propias estadísticas; una búsqueda filtrada por `process_category` es una
+búsqueda en un diccionario más una búsqueda en un índice mucho más chico.
+"""
+
+import heapq
+import math
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, NamedTuple, Optional, Text, Tuple
+
+from .spelling import SpellingCorrector
+from .text_normalizer import fold_accents, normalize, normalize_query
+
+# Peso de cada campo al calcular la frecuencia de un término en una FAQ
+FIELD_WEIGHTS: Dict[Text, float] = {
+    'pregunta': 3.0,
+    'keywords': 2.5,
+    'tags': 1.5,
+    'respuesta': 1.0,
+}
+
+# Parámetros estándar de BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+
+def category_key(categoria: Text) -> Text:
+    """Clave normalizada de una categoría ("Registro Civil y DNI" -> "registro civil y dni")."""
+    return " ".join(fold_accents(categoria).split())
+
+
+def _field_text(faq: Dict[Text, Any], field: Text) -> Text:
+    value = faq.get(field) or ''
+    if isinstance(value, (list, tuple)):
+        return " ".join(value)
+    return value
+
+
+class FAQMatch(NamedTuple):
+    """Resultado de una búsqueda: la FAQ, su puntaje BM25 y la confianza (0-1)."""
+    faq: Dict[Text, Any]
+    score: float
+    confidence: float
+
+
+class FAQIndex:
+    """Índice invertido: término normalizado -> [(id interno de FAQ, frecuencia ponderada)]."""
+
+    # Confianza mínima para responder con una FAQ o sugerirla como alternativa
+    MIN_CONFIDENCE = 0.5
+
+    _corrector: Optional[SpellingCorrector] = None
+
+    def __init__(self, faqs: Iterable[Dict[Text, Any]],
+                 field_weights: Optional[Dict[Text, float]] = None,
+                 k1: float = BM25_K1,
+                 b: float = BM25_B,
+                 partitioned: bool = True):
+        self.faqs: List[Dict[Text, Any]] = list(faqs)
+        self.field_weights = field_weights or FIELD_WEIGHTS
+        self.k1 = k1
+        self.b = b
+
+        # Ids (en este índice) de las FAQs de cada categoría, y una partición por categoría
+        self.partition_doc_ids: Dict[Text, List[int]] = defaultdict(list)
+        self.partitions: Dict[Text, FAQIndex] = {}
+        if partitioned:
+            for doc_id, faq in enumerate(self.faqs):
+                self.partition_doc_ids[category_key(faq.get('categoria', ''))].append(doc_id)
+            self.partitions = {
+                key: FAQIndex([self.faqs[doc_id] for doc_id in doc_ids],
+                              self.field_weights, k1, b, partitioned=False)
+                for key, doc_ids in self.partition_doc_ids.items()
+            }
+        self.partition_doc_ids = dict(self.partition_doc_ids)
+
+        postings: Dict[Text, List[Tuple[int, float]]] = defaultdict(list)
+        self.doc_lengths: List[float] = []
+
+        for doc_id, faq in enumerate(self.faqs):
+            term_freqs: Dict[Text, float] = defaultdict(float)
+            for field, weight in self.field_weights.items():
+                for term in normalize(_field_text(faq, field)):
+                    term_freqs[term] += weight
+            for term, freq in term_freqs.items():
+                postings[term].append((doc_id, freq))
+            self.doc_lengths.append(sum(term_freqs.values()))
+
+        # Congelamos el diccionario para que las búsquedas no creen entradas vacías
+        self.postings: Dict[Text, List[Tuple[int, float]]] = dict(postings)
+
+        total_docs = len(self.faqs)
+        avg_length = (sum(self.doc_lengths) / total_docs) if total_docs else 0.0
+        self.idf: Dict[Text, float] = {
+            term: math.log(1 + (total_docs - len(docs) + 0.5) / (len(docs) + 0.5))
+            for term, docs in self.postings.items()
+        }
+        # Los términos de la consulta que no están en el índice cuentan con el IDF
+        # promedio al normalizar, para que una sola coincidencia no dé confianza alta
+        self.default_idf = (sum(self.idf.values()) / len(self.idf)) if self.idf else 0.0
+        # Parte del denominador de BM25 que depende solo del documento
+        self.length_norms: List[float] = [
+            k1 * (1 - b + b * length / avg_length) if avg_length else k1
+            for length in self.doc_lengths
+        ]
+        # Diccionario de correcciones sobre el vocabulario global; las particiones
+        # lo comparten (una corrección que no está en la partición no suma)
+        if partitioned:
+            self._corrector = SpellingCorrector(self._vocabulary())
+            for partition in self.partitions.values():
+                partition._corrector = self._corrector
+
+    def __len__(self) -> int:
+        return len(self.length_norms)
+
+    def partition(self, categoria: Text) -> Optional['FAQIndex']:
+        """Índice de una sola categoría, o None si la categoría no existe."""
+        return self.partitions.get(category_key(categoria))
+
+    def pool_size(self, categoria: Optional[Text] = None) -> int:
+        """Cantidad de FAQs candidatas para la categoría indicada (o todas)."""
+        if not categoria:
+            return len(self)
+        partition = self.partition(categoria)
+        return len(partition) if partition is not None else 0
+
+    @property
+    def corrector(self) -> SpellingCorrector:
+        """Corrector ortográfico del vocabulario; se arma la primera vez que se usa."""
+        if self._corrector is None:
+            self._corrector = SpellingCorrector(self._vocabulary())
+        return self._corrector
+
+    def query_key(self, text: Text) -> Tuple[Text, ...]:
+        """Forma canónica de la consulta: dos textos con la misma clave dan el mismo resultado."""
+        return tuple(sorted(set(normalize_query(text))))
+
+    # Acceso al almacenamiento; CompiledFAQIndex lo redefine sobre un archivo mapeado
+
+    def _lookup(self, term: Text) -> Optional[Tuple[float, Iterable[Tuple[int, float]]]]:
+        """Devuelve (idf, posteos) del término, o None si no está en el índice."""
+        docs = self.postings.get(term)
+        if not docs:
+            return None
+        return self.idf[term], docs
+
+    def _document(self, doc_id: int) -> Dict[Text, Any]:
+        return self.faqs[doc_id]
+
+    def _vocabulary(self) -> Iterable[Tuple[Text, int]]:
+        """Términos del índice con la cantidad de FAQs en las que aparecen."""
+        return ((term, len(docs)) for term, docs in self.postings.items())
+
+    def search(self, text: Text,
+               categoria: Optional[Text] = None,
+               k: int = 3) -> List[FAQMatch]:
+        """
+        Devuelve las `k` FAQs con mayor puntaje BM25, de mayor a menor.
+        La confianza es el puntaje dividido por el máximo que podrían aportar
+        los términos de la consulta. Con `categoria` se busca en su partición.
+        Los términos que no están en el índice se corrigen con `corrector`.
+        """
+        if categoria:
+            partition = self.partition(categoria)
+            return partition.search(text, k=k) if partition is not None else []
+
+        length_norms = self.length_norms
+        k1_plus_one = self.k1 + 1
+        scores: Dict[int, float] = defaultdict(float)
+        max_score = 0.0
+        matched_terms = set()
+
+        for term in set(normalize_query(text)):
+            entry = self._lookup(term)
+            if entry is None:
+                # Búsqueda en el diccionario de borrados: no recorre el vocabulario
+                term = self.corrector.correct(term)
+                entry = self._lookup(term) if term is not None else None
+            if entry is None or term in matched_terms:
+                max_score += self.default_idf * k1_plus_one
+                continue
+            matched_terms.add(term)
+            idf, docs = entry
+            max_score += idf * k1_plus_one
+            for doc_id, freq in docs:
+                scores[doc_id] += idf * freq * k1_plus_one / (freq + length_norms[doc_id])
+
+        # heapq.nlargest mantiene un heap acotado a k elementos
+        top = heapq.nlargest(k, scores.items(), key=lambda item: (item[1], -item[0]))
+        return [
+            FAQMatch(self._document(doc_id), score, score / max_score)
+            for doc_id, score in top
+        ]
+
+
+def confident_matches(index: Any, text: Text,
+                      categoria: Optional[Text] = None,
+                      k: int = 3) -> List[FAQMatch]:
+    """
+    Búsqueda tal como la hace ActionSearchFAQ: las `k` mejores FAQs de
+    `index` (FAQIndex, CompiledFAQIndex o CharNGramMatcher) que alcanzan su
+    MIN_CONFIDENCE. La primera es la respuesta y el resto, sugerencias.
+    """
+    return [
+        match for match in index.search(text, categoria, k=k)
+        if match.confidence >= index.MIN_CONFIDENCE
+    ]
@@ -0,0 +1,156 @@
+"""
+Recarga en caliente del índice de FAQs.
+El índice vigente vive en un `FAQIndexHolder`. Ante un cambio en los archivos
+vigilados o una señal "reload" por Redis pub/sub, se reconstruye en un hilo
+en segundo plano y se reemplaza con una sola asignación: las búsquedas nunca
+se bloquean ni ven un índice a medio construir, y no hace falta reiniciar el
+servidor de acciones.
+"""
+
+import logging
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional, Text, Tuple
+
+from . import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class FAQIndexHolder:
+    """Mantiene el índice de FAQs vigente y lo reconstruye bajo demanda."""
+
+    def __init__(self, loader: Callable[[], Any]):
+        self._loader = loader
+        self._reload_lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self._reload_requested = threading.Event()
+        self._worker: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._listeners: List[Callable[[Any], None]] = []
+
+        started = time.perf_counter()
+        # (índice, generación) en una sola referencia, para leer los dos juntos
+        self._current: Tuple[Any, int] = (loader(), 1)
+        self.last_reload_seconds = time.perf_counter() - started
+        self.last_reload_at = time.time()
+        self.last_error: Optional[Text] = None
+
+    @property
+    def index(self) -> Any:
+        """Índice vigente; leer la referencia es atómico, se use desde el hilo que se use."""
+        return self._current[0]
+
+    @property
+    def generation(self) -> int:
+        return self._current[1]
+
+    def snapshot(self) -> Tuple[Any, int]:
+        """El índice vigente y su generación, leídos juntos (ninguna recarga queda en el medio)."""
+        return self._current
+
+    def add_listener(self, callback: Callable[[Any], None]) -> None:
+        """Registra `callback(nuevo_indice)`, que se llama después de cada recarga."""
+        self._listeners.append(callback)
+
+    def stats(self) -> Dict[Text, Any]:
+        """Datos para monitoreo: generación, latencia y momento de la última recarga."""
+        return {
+            "generation": self.generation,
+            "size": len(self.index),
+            "last_reload_seconds": self.last_reload_seconds,
+            "last_reload_at": self.last_reload_at,
+            "last_error": self.last_error,
+        }
+
+    def reload(self, wait: bool = False) -> None:
+        """
+        Pide reconstruir el índice. Por defecto lo hace el hilo de recarga y
+        la llamada vuelve enseguida; varias señales seguidas se agrupan en
+        una sola reconstrucción. Con `wait=True` se reconstruye en el acto.
+        """
+        if wait:
+            self._rebuild()
+            return
+        with self._reload_lock:
+            if self._worker is None:
+                self._worker = threading.Thread(target=self._run_worker, name="faq-reload", daemon=True)
+                self._worker.start()
+        self._reload_requested.set()
+
+    def _run_worker(self) -> None:
+        while True:
+            self._reload_requested.wait()
+            if self._stop.is_set():
+                return
+            self._reload_requested.clear()
+            self._rebuild()
+
+    def _rebuild(self) -> None:
+        with self._rebuild_lock:
+            started = time.perf_counter()
+            try:
+                new_index = self._loader()
+            except Exception as e:
+                # Si la nueva versión falla seguimos sirviendo la anterior
+                self.last_error = str(e)
+                logger.exception("Error al recargar el índice de FAQs")
+                return
+            self._current = (new_index, self.generation + 1)
+            self.last_reload_seconds = time.perf_counter() - started
+            self.last_reload_at = time.time()
+            self.last_error = None
+        logger.info("Índice de FAQs recargado: generación %s, %s FAQs en %.3fs",
+                    self.generation, len(new_index), self.last_reload_seconds)
+        metrics.emit("faq.index_generation", self.generation)
+        metrics.emit("faq.reload_seconds", self.last_reload_seconds)
+        for callback in self._listeners:
+            try:
+                callback(new_index)
+            except Exception:
+                logger.exception("Error en un listener de recarga de FAQs")
+
+    def watch_files(self, paths: Iterable[Text], interval: float = 5.0) -> None:
+        """Recarga cuando cambia la fecha de modificación de alguno de los archivos."""
+        paths = list(paths)
+
+        def snapshot() -> Tuple[Optional[float], ...]:
+            return tuple(
+                os.stat(path).st_mtime if os.path.exists(path) else None for path in paths
+            )
+
+        def watch() -> None:
+            last = snapshot()
+            while not self._stop.wait(interval):
+                current = snapshot()
+                if current != last:
+                    last = current
+                    logger.info("Cambio detectado en %s, recargando FAQs", paths)
+                    self.reload()
+
+        threading.Thread(target=watch, name="faq-file-watcher", daemon=True).start()
+
+    def listen_redis(self, redis_url: Text, channel: Text = "faq_reload") -> None:
+        """Recarga al recibir cualquier mensaje en el canal de Redis indicado."""
+        import redis
+
+        def listen() -> None:
+            while not self._stop.is_set():
+                try:
+                    pubsub = redis.from_url(redis_url).pubsub(ignore_subscribe_messages=True)
+                    pubsub.subscribe(channel)
+                    for message in pubsub.listen():
+                        if message["type"] == "message":
+                            logger.info("Señal de recarga recibida por Redis (%s)", channel)
+                            self.reload()
+                except Exception:
+                    logger.exception("Conexión a Redis perdida, reintentando en 5s")
+                    self._stop.wait(5)
+
+        threading.Thread(target=listen, name="faq-redis-listener", daemon=True).start()
+
+    def stop(self) -> None:
+        """Detiene los hilos de vigilancia (el listener de Redis termina al reconectar)."""
+        self._stop.set()
+        self._reload_requested.set()
@@ -0,0 +1,110 @@
+"""
+Buscador de FAQs por similitud TF-IDF sobre n-gramas de caracteres.
+Usa el mismo analizador `char_wb` de 1 a 4 caracteres que el
+CountVectorsFeaturizer de `config.yml`, por lo que tolera errores de tipeo
+y tildes faltantes ("licensia", "habilitasion").
+
+La matriz TF-IDF de las FAQs se precalcula una sola vez como matriz CSR;
+cada consulta (o lote de consultas) se resuelve con un único producto
+disperso. numpy, scipy y scikit-learn vienen como dependencias de Rasa.
+"""
+
+from collections import defaultdict
+from typing import Any, Dict, Iterable, List, Optional, Text
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+
+from .faq_index import FAQMatch, _field_text, category_key
+from .text_normalizer import clean_text
+
+# Campos que se vectorizan; la respuesta es demasiado larga y diluye los n-gramas
+VECTORIZED_FIELDS = ('pregunta', 'keywords', 'tags')
+
+
+class CharNGramMatcher:
+    """Matriz TF-IDF (FAQs x n-gramas) en formato CSR, con filas normalizadas (L2)."""
+
+    # Similitud coseno mínima para responder con una FAQ o sugerirla como alternativa
+    MIN_CONFIDENCE = 0.3
+
+    def __init__(self, faqs: Iterable[Dict[Text, Any]],
+                 min_ngram: int = 1,
+                 max_ngram: int = 4):
+        self.faqs: List[Dict[Text, Any]] = list(faqs)
+
+        # El preprocesador pliega tildes y quita stopwords; los n-gramas ya
+        # cubren plurales y variantes, así que no se aplica stemming
+        self.vectorizer = TfidfVectorizer(
+            analyzer='char_wb',
+            ngram_range=(min_ngram, max_ngram),
+            preprocessor=clean_text,
+            sublinear_tf=True,
+            dtype=np.float32,
+        )
+        documents = [
+            " ".join(_field_text(faq, field) for field in VECTORIZED_FIELDS)
+            for faq in self.faqs
+        ]
+        # Guardamos la transpuesta (n-gramas x FAQs) para multiplicar directamente
+        self.matrix_t = self.vectorizer.fit_transform(documents).T.tocsr() if self.faqs else None
+
+        # Por categoría: ids de sus FAQs y las columnas de la matriz correspondientes
+        rows = defaultdict(list)
+        for doc_id, faq in enumerate(self.faqs):
+            rows[category_key(faq.get('categoria', ''))].append(doc_id)
+        self.partition_rows = {key: np.array(ids) for key, ids in rows.items()}
+        self.partition_matrices = {
+            key: self.matrix_t[:, ids].tocsr() for key, ids in self.partition_rows.items()
+        }
+
+    def __len__(self) -> int:
+        return len(self.faqs)
+
+    def pool_size(self, categoria: Optional[Text] = None) -> int:
+        """Cantidad de FAQs candidatas para la categoría indicada (o todas)."""
+        if not categoria:
+            return len(self.faqs)
+        rows = self.partition_rows.get(category_key(categoria))
+        return len(rows) if rows is not None else 0
+
+    def query_key(self, text: Text) -> Text:
+        """Forma canónica de la consulta: dos textos con la misma clave dan el mismo resultado."""
+        return clean_text(text)
+
+    def score_batch(self, texts: List[Text]) -> np.ndarray:
+        """
+        Similitud coseno de cada consulta contra todas las FAQs.
+        Devuelve una matriz densa de forma (len(texts), len(faqs)).
+        """
+        if self.matrix_t is None:
+            return np.zeros((len(texts), 0), dtype=np.float32)
+        queries = self.vectorizer.transform(texts)
+        return (queries @ self.matrix_t).toarray()
+
+    def search(self, text: Text,
+               categoria: Optional[Text] = None,
+               k: int = 3) -> List[FAQMatch]:
+        """Devuelve las `k` FAQs más similares; la confianza es la similitud coseno."""
+        if not self.faqs:
+            return []
+        if categoria:
+            key = category_key(categoria)
+            if key not in self.partition_rows:
+                return []
+            # Solo se multiplica contra las columnas de la categoría
+            doc_ids = self.partition_rows[key]
+            scores = (self.vectorizer.transform([text]) @ self.partition_matrices[key]).toarray()[0]
+        else:
+            doc_ids = np.arange(len(self.faqs))
+            scores = self.score_batch([text])[0]
+
+        k = min(k, len(scores))
+        # argpartition selecciona el top-k en O(n) y solo ordenamos esos k
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top], kind='stable')]
+        return [
+            FAQMatch(self.faqs[doc_ids[i]], float(scores[i]), float(scores[i]))
+            for i in top
+            if scores[i] > 0
+        ]
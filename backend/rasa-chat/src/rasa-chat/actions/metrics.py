@@ -0,0 +1,33 @@
+"""
+Hook de métricas del servidor de acciones.
+Las acciones reportan valores con `emit(nombre, valor, **etiquetas)` en lugar
+de imprimirlos en cada mensaje. Por defecto se escriben en el log en nivel
+DEBUG; para enviarlos a otro sistema (StatsD, Prometheus, etc.) se registra
+un hook con `register_hook`.
+"""
+
+import logging
+from typing import Any, Callable, List, Text
+
+logger = logging.getLogger(__name__)
+
+MetricHook = Callable[..., None]
+
+_hooks: List[MetricHook] = []
+
+
+def register_hook(hook: MetricHook) -> None:
+    """Registra una función `hook(nombre, valor, **etiquetas)` que recibe cada métrica."""
+    _hooks.append(hook)
+
+
+def emit(name: Text, value: float, **tags: Any) -> None:
+    """Reporta una métrica; un hook que falla nunca interrumpe la acción."""
+    if not _hooks:
+        logger.debug("%s=%s %s", name, value, tags)
+        return
+    for hook in _hooks:
+        try:
+            hook(name, value, **tags)
+        except Exception:
+            logger.exception("Error en el hook de métricas %r", hook)
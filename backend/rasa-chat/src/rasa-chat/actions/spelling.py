@@ -0,0 +1,121 @@
+"""
+Corrección de errores de tipeo estilo SymSpell para la búsqueda de FAQs.
+Por cada término del vocabulario del índice se precalculan sus variantes
+con hasta `max_distance` letras borradas (solo sobre los primeros
+`prefix_length` caracteres, para acotar la memoria). Corregir un término
+desconocido es generar sus propias variantes borradas y buscarlas en ese
+diccionario: unas pocas decenas de búsquedas en un dict, sin importar el
+tamaño del vocabulario, y después se confirma la distancia real de cada
+candidato.
+
+Trabaja sobre los términos ya normalizados (sin tildes y con stemming), así
+que "licensias" se corrige a la raíz "licenci" del índice.
+"""
+
+from typing import Dict, Iterable, List, Optional, Set, Text, Tuple
+
+MAX_EDIT_DISTANCE = 2
+PREFIX_LENGTH = 7
+# Los términos cortos admiten menos errores: "mult" no debería volverse "much"
+MIN_LENGTH_FOR_DISTANCE = {1: 4, 2: 7}
+
+
+def _deletes(word: Text, max_distance: int) -> Set[Text]:
+    """Todas las variantes de `word` con hasta `max_distance` letras borradas."""
+    result = {word}
+    frontier = {word}
+    for _ in range(max_distance):
+        next_frontier = set()
+        for candidate in frontier:
+            if len(candidate) <= 1:
+                continue
+            for i in range(len(candidate)):
+                next_frontier.add(candidate[:i] + candidate[i + 1:])
+        next_frontier -= result
+        result |= next_frontier
+        frontier = next_frontier
+    return result
+
+
+def edit_distance(a: Text, b: Text, limit: int) -> int:
+    """
+    Distancia de Damerau-Levenshtein (transposiciones adyacentes), cortando
+    en cuanto supera `limit`; en ese caso devuelve `limit + 1`.
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous_previous: List[int] = []
+    previous = list(range(len(b) + 1))
+    for i in range(1, len(a) + 1):
+        current = [i] + [0] * len(b)
+        row_min = i
+        for j in range(1, len(b) + 1):
+            cost = 0 if a[i - 1] == b[j - 1] else 1
+            value = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+            if i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+                value = min(value, previous_previous[j - 2] + 1)
+            current[j] = value
+            row_min = min(row_min, value)
+        if row_min > limit:
+            return limit + 1
+        previous_previous, previous = previous, current
+    return min(previous[-1], limit + 1)
+
+
+def allowed_distance(term: Text, max_distance: int = MAX_EDIT_DISTANCE) -> int:
+    """Cantidad de errores que se le toleran a un término según su largo."""
+    allowed = 0
+    for distance, min_length in MIN_LENGTH_FOR_DISTANCE.items():
+        if distance <= max_distance and len(term) >= min_length:
+            allowed = distance
+    return allowed
+
+
+class SpellingCorrector:
+    """Diccionario de borrados: variante borrada -> términos del vocabulario que la generan."""
+
+    def __init__(self, vocabulary: Iterable[Tuple[Text, int]],
+                 max_distance: int = MAX_EDIT_DISTANCE,
+                 prefix_length: int = PREFIX_LENGTH):
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        # Frecuencia de documento de cada término, para desempatar candidatos
+        self.frequencies: Dict[Text, int] = dict(vocabulary)
+        self.deletes: Dict[Text, List[Text]] = {}
+        for term in self.frequencies:
+            for variant in _deletes(term[:prefix_length], allowed_distance(term, max_distance)):
+                self.deletes.setdefault(variant, []).append(term)
+
+    def __len__(self) -> int:
+        return len(self.frequencies)
+
+    def correct(self, term: Text) -> Optional[Text]:
+        """
+        Término del vocabulario más cercano a `term`, o None si ninguno está a
+        la distancia permitida. Desempata por distancia, después por la
+        cantidad de FAQs que usan el término y por último alfabéticamente.
+        """
+        if term in self.frequencies:
+            return term
+        limit = allowed_distance(term, self.max_distance)
+        if not limit:
+            return None
+
+        best: Optional[Tuple[int, int, Text]] = None
+        seen: Set[Text] = set()
+        for variant in _deletes(term[:self.prefix_length], limit):
+            for candidate in self.deletes.get(variant, ()):
+                if candidate in seen:
+                    continue
+                seen.add(candidate)
+                # Un término del vocabulario tampoco admite más errores de los que tolera su largo
+                candidate_limit = min(limit, allowed_distance(candidate, self.max_distance))
+                if not candidate_limit:
+                    continue
+                distance = edit_distance(term, candidate, candidate_limit)
+                if distance > candidate_limit:
+                    continue
+                key = (distance, -self.frequencies[candidate], candidate)
+                if best is None or key < best:
+                    best = key
+        return best[2] if best is not None else None
@@ -0,0 +1,263 @@
+"""
+Benchmark offline de la búsqueda de FAQs (velocidad y calidad).
+Corre las consultas por la misma lógica que ActionSearchFAQ
+(`confident_matches`), sin levantar Rasa ni el servidor de acciones:
+
+- consultas etiquetadas de `benchmarks/faq_queries.yml` (FAQ esperada o
+  ninguna), que dan la precisión top-1 / top-3 y la tasa de rechazo;
+- ejemplos de `data/nlu.yml`: los de `ask_faq` (con su `process_category`)
+  solo suman a la latencia y los de `nlu_fallback` deberían quedar sin
+  respuesta.
+
+Para cada buscador informa latencia p50/p95/p99 por consulta, consultas por
+segundo, memoria que ocupa el índice y precisión, primero con el corpus real
+y después con corpus inflados sintéticamente.
+
+Uso (desde la carpeta del bot):
+    python -m benchmarks.faq_benchmark
+    python -m benchmarks.faq_benchmark --matchers bm25 compiled --sizes 1000 10000
+"""
+
+import argparse
+import json
+import os
+import random
+import re
+import string
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Text
+
+import yaml
+
+from actions.faq_artifact import CompiledFAQIndex, compile_faqs
+from actions.faq_index import FAQIndex, _field_text, confident_matches
+from actions.faq_vectorizer import CharNGramMatcher
+from actions.text_normalizer import TOKEN_PATTERN, fold_accents, normalize_query
+
+BENCHMARK_DIR = os.path.dirname(os.path.abspath(__file__))
+DEFAULT_QUERIES = os.path.join(BENCHMARK_DIR, 'faq_queries.yml')
+DEFAULT_NLU = os.path.join(BENCHMARK_DIR, '..', 'data', 'nlu.yml')
+DEFAULT_SIZES = (1000, 10000, 100000)
+
+# Misma cantidad de resultados que pide ActionSearchFAQ
+TOP_K = 3
+
+# Entidades en los ejemplos de NLU: "[licencias de conducir](process_category)"
+ENTITY_PATTERN = re.compile(r'\[([^\]]+)\]\((\w+)\)')
+
+
+class Query(NamedTuple):
+    text: Text
+    categoria: Optional[Text]
+    # None: la consulta solo mide latencia; 0: no debería responder ninguna FAQ
+    faq_id: Optional[int]
+
+
+def load_labelled_queries(path: Text) -> List[Query]:
+    with open(path, encoding='utf-8') as f:
+        entries = yaml.safe_load(f)['queries']
+    return [
+        Query(entry['text'], entry.get('categoria'), entry.get('faq_id') or 0)
+        for entry in entries
+    ]
+
+
+def load_nlu_queries(path: Text) -> List[Query]:
+    """Ejemplos de `ask_faq` (sin etiqueta) y de `nlu_fallback` (sin respuesta esperada)."""
+    with open(path, encoding='utf-8') as f:
+        nlu = yaml.safe_load(f).get('nlu', [])
+
+    queries = []
+    for block in nlu:
+        intent = block.get('intent')
+        if intent not in ('ask_faq', 'nlu_fallback'):
+            continue
+        for line in block.get('examples', '').splitlines():
+            example = line.strip().lstrip('- ').strip()
+            if not example:
+                continue
+            entities = {name: value for value, name in ENTITY_PATTERN.findall(example)}
+            text = ENTITY_PATTERN.sub(r'\1', example)
+            faq_id = 0 if intent == 'nlu_fallback' else None
+            queries.append(Query(text, entities.get('process_category'), faq_id))
+    return queries
+
+
+def inflate_corpus(faqs: Sequence[Dict[Text, Any]], size: int, seed: int = 0) -> List[Dict[Text, Any]]:
+    """
+    Agrega FAQs sintéticas hasta llegar a `size`. Mezclan palabras reales del
+    corpus (para competir con las FAQs verdaderas) con pseudo-palabras nuevas
+    (para que el vocabulario crezca con el corpus); las categorías son las reales.
+    """
+    rng = random.Random(seed)
+    vocabulary = sorted({
+        token
+        for faq in faqs
+        for field in ('pregunta', 'respuesta', 'keywords', 'tags')
+        for token in TOKEN_PATTERN.findall(fold_accents(_field_text(faq, field)))
+    })
+    pseudo_words = [
+        "".join(rng.choices(string.ascii_lowercase, k=rng.randint(5, 10)))
+        for _ in range(max(1000, size // 2))
+    ]
+    categories = sorted({faq['categoria'] for faq in faqs})
+
+    def words(count: int) -> Text:
+        return " ".join(
+            rng.choice(vocabulary) if rng.random() < 0.7 else rng.choice(pseudo_words)
+            for _ in range(count)
+        )
+
+    corpus = list(faqs)
+    next_id = max(faq['id'] for faq in faqs) + 1
+    while len(corpus) < size:
+        corpus.append({
+            'id': next_id,
+            'categoria': rng.choice(categories),
+            'subcategoria': '',
+            'pregunta': words(8),
+            'respuesta': words(40),
+            'keywords': [words(2) for _ in range(4)],
+            'url_referencia': '',
+            'tags': [words(1) for _ in range(3)],
+        })
+        next_id += 1
+    return corpus
+
+
+def build_matcher(name: Text, faqs: List[Dict[Text, Any]], workdir: Text) -> Any:
+    if name == 'bm25':
+        return FAQIndex(faqs)
+    if name == 'compiled':
+        path = os.path.join(workdir, f'faqs_{len(faqs)}.bin')
+        compile_faqs(faqs, path)
+        return CompiledFAQIndex(path)
+    if name == 'tfidf':
+        return CharNGramMatcher(faqs)
+    raise ValueError(f"Buscador desconocido: {name}")
+
+
+def measure_memory(build: Callable[[], Any]) -> tuple:
+    """Construye el buscador y devuelve (buscador, bytes que quedan asignados)."""
+    tracemalloc.start()
+    try:
+        matcher = build()
+        allocated, _peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return matcher, allocated
+
+
+def percentile(sorted_values: Sequence[float], pct: float) -> float:
+    """Percentil por rango más cercano sobre una lista ya ordenada."""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, round(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def run_queries(matcher: Any, queries: Sequence[Query], repeat: int) -> Dict[Text, Any]:
+    latencies: List[float] = []
+    top1 = top3 = positives = rejected = negatives = 0
+
+    for iteration in range(repeat):
+        # Sin la caché de consultas normalizadas: cada pasada mide el camino frío
+        normalize_query.cache_clear()
+        for query in queries:
+            started = time.perf_counter()
+            matches = confident_matches(matcher, query.text, query.categoria, k=TOP_K)
+            latencies.append(time.perf_counter() - started)
+
+            if iteration or query.faq_id is None:
+                continue
+            ids = [match.faq['id'] for match in matches]
+            if query.faq_id:
+                positives += 1
+                top1 += bool(ids) and ids[0] == query.faq_id
+                top3 += query.faq_id in ids
+            else:
+                negatives += 1
+                rejected += not ids
+
+    latencies.sort()
+    return {
+        'queries': len(queries),
+        'p50_ms': percentile(latencies, 50) * 1000,
+        'p95_ms': percentile(latencies, 95) * 1000,
+        'p99_ms': percentile(latencies, 99) * 1000,
+        'qps': len(latencies) / sum(latencies) if latencies else 0.0,
+        'top1': top1 / positives if positives else 0.0,
+        'top3': top3 / positives if positives else 0.0,
+        'rejection': rejected / negatives if negatives else 0.0,
+    }
+
+
+def benchmark(faqs: List[Dict[Text, Any]], queries: Sequence[Query],
+              matchers: Sequence[Text], sizes: Sequence[int],
+              repeat: int) -> List[Dict[Text, Any]]:
+    corpora = [('base', faqs)] + [
+        (str(size), inflate_corpus(faqs, size)) for size in sizes if size > len(faqs)
+    ]
+    results = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for label, corpus in corpora:
+            for name in matchers:
+                # El tiempo de construcción incluye el costo de tracemalloc
+                started = time.perf_counter()
+                matcher, memory = measure_memory(lambda: build_matcher(name, corpus, workdir))
+                build_seconds = time.perf_counter() - started
+                result = {
+                    'matcher': name,
+                    'corpus': label,
+                    'faqs': len(corpus),
+                    'build_s': build_seconds,
+                    'memory_mb': memory / 2 ** 20,
+                }
+                if name == 'compiled':
+                    # Las páginas del archivo mapeado no pasan por el allocator de Python
+                    result['artifact_mb'] = os.path.getsize(matcher.path) / 2 ** 20
+                result.update(run_queries(matcher, queries, repeat))
+                results.append(result)
+                print_result(result)
+                del matcher
+    return results
+
+
+def print_result(result: Dict[Text, Any]) -> None:
+    artifact = f" (+{result['artifact_mb']:.1f} MB mmap)" if 'artifact_mb' in result else ""
+    print(
+        f"{result['matcher']:<8} {result['corpus']:>6} FAQs={result['faqs']:<7} "
+        f"build={result['build_s']:.2f}s mem={result['memory_mb']:.1f} MB{artifact} | "
+        f"p50={result['p50_ms']:.3f} p95={result['p95_ms']:.3f} p99={result['p99_ms']:.3f} ms "
+        f"{result['qps']:.0f} q/s | top1={result['top1']:.0%} top3={result['top3']:.0%} "
+        f"rechazo={result['rejection']:.0%}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark offline de la búsqueda de FAQs.")
+    parser.add_argument('--queries', default=DEFAULT_QUERIES, help="Consultas etiquetadas (YAML)")
+    parser.add_argument('--nlu', default=DEFAULT_NLU, help="Archivo de NLU de Rasa")
+    parser.add_argument('--matchers', nargs='+', default=['bm25', 'compiled', 'tfidf'],
+                        choices=['bm25', 'compiled', 'tfidf'])
+    parser.add_argument('--sizes', nargs='*', type=int, default=list(DEFAULT_SIZES),
+                        help="Tamaños de los corpus inflados (por defecto: 1000 10000 100000)")
+    parser.add_argument('--repeat', type=int, default=5, help="Pasadas por conjunto de consultas")
+    parser.add_argument('--json', help="Guarda los resultados en este archivo")
+    args = parser.parse_args()
+
+    from actions.gcba_faqs_db import faqs_database
+
+    queries = load_labelled_queries(args.queries) + load_nlu_queries(args.nlu)
+    print(f"{len(queries)} consultas, {len(faqs_database)} FAQs reales\n")
+    results = benchmark(faqs_database, queries, args.matchers, args.sizes, args.repeat)
+
+    if args.json:
+        with open(args.json, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()